@@ -0,0 +1,100 @@
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+import redis
+from fastapi import Response
+from prometheus_client import Counter
+from pydantic import TypeAdapter
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.redis import redis_client
+from app.core.responses import json_body
+
+# Namespaces group cache entries that are invalidated together
+CATALOG = "catalog"  # product listings, featured, brands, facets
+CATEGORIES = "categories"
+
+# Response headers that are part of a cached response
+CACHED_HEADERS = (NEXT_CURSOR_HEADER,)
+
+CACHE_HITS = Counter("response_cache_hits_total", "Response cache hits", ["endpoint"])
+CACHE_MISSES = Counter("response_cache_misses_total", "Response cache misses", ["endpoint"])
+
+def product_namespace(product_id: int) -> str:
+    return f"product:{product_id}"
+
+def _members_key(namespace: str) -> str:
+    return f"cache:{namespace}:keys"
+
+def cache_key(namespace: str, endpoint: str, params: Dict[str, Any]) -> str:
+    """Key built from the endpoint's resolved parameters, so defaults and ordering don't matter."""
+    normalized = {k: v for k, v in params.items() if v is not None}
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+    return f"cache:{namespace}:{endpoint}:{digest}"
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def cached_response(
+    response: Response,
+    namespace: str,
+    endpoint: str,
+    params: Dict[str, Any],
+    ttl: int,
+    build: Callable[[], Any],
+    model: Any,
+    exclude_unset: bool = False,
+) -> Response:
+    """
+    Return the cached body for these parameters, or call `build()` and cache its result.
+    The result is validated against `model` (ORM objects are read by attribute) and encoded
+    to JSON once; the encoded bytes are cached and sent as they are, so hits skip both
+    decoding and re-encoding. Headers in CACHED_HEADERS are cached along with the body.
+    Entries in one namespace should share a TTL, since the namespace's key set expires with them.
+    """
+    key = cache_key(namespace, endpoint, params)
+    try:
+        cached = redis_client.get(key)
+    except redis.RedisError:
+        cached = None
+
+    # Stored as one line of JSON headers, then the body (entries without one are from an older format)
+    headers, separator, body = (cached or "").partition("\n")
+    if separator:
+        CACHE_HITS.labels(endpoint).inc()
+        for name, value in json.loads(headers).items():
+            response.headers[name] = value
+        return json_body(response, body.encode("utf-8"))
+
+    CACHE_MISSES.labels(endpoint).inc()
+    adapter = _adapter(model)
+    body = adapter.dump_json(adapter.validate_python(build(), from_attributes=True), exclude_unset=exclude_unset)
+    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+    try:
+        pipe = redis_client.pipeline()
+        pipe.setex(key, ttl, json.dumps(headers) + "\n" + body.decode("utf-8"))
+        # Track the key under its namespace so invalidation can find it without SCAN
+        pipe.sadd(_members_key(namespace), key)
+        pipe.expire(_members_key(namespace), ttl)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+    return json_body(response, body)
+
+def invalidate(*namespaces: str):
+    """Drop every cached response in the given namespaces."""
+    try:
+        for namespace in namespaces:
+            members_key = _members_key(namespace)
+            keys = redis_client.smembers(members_key)
+            redis_client.delete(members_key, *keys)
+    except redis.RedisError:
+        pass
+
+def invalidate_product(product_id: Optional[int] = None):
+    """A product was created, changed or re-rated: drop catalog listings and its detail page."""
+    if product_id is None:
+        invalidate(CATALOG)
+    else:
+        invalidate(CATALOG, product_namespace(product_id))
@@ -8,9 +8,40 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440 # 24 hours for dev convenience
     DATABASE_URL: str = "postgresql://user:password@db:5432/ecommerce_db"
     
+    # Async Redis pool used by the request handlers
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    
     # Stripe settings
     STRIPE_SECRET_KEY: Optional[str] = None
     STRIPE_WEBHOOK_SECRET: Optional[str] = None
+    
+    # Catalog response caching (seconds)
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    PRODUCT_CACHE_TTL_SECONDS: int = 300
+    CATEGORY_CACHE_TTL_SECONDS: int = 600
+    # Process-local category counts; writes in this process invalidate them immediately
+    CATEGORY_COUNTS_TTL_SECONDS: int = 60
+    
+    # Cart pricing fields cached per product in Redis (dropped on product writes)
+    CART_PRODUCT_CACHE_TTL_SECONDS: int = 3600
+    
+    # Carts expire this long after they were last read or changed (seconds)
+    CART_TTL_SECONDS: int = 30 * 24 * 3600
+    GUEST_CART_TTL_SECONDS: int = 7 * 24 * 3600
+    # Carts left this long are reported once as abandoned, by a sweep every CART_SWEEP_INTERVAL_SECONDS
+    ABANDONED_CART_AFTER_SECONDS: int = 24 * 3600
+    CART_SWEEP_INTERVAL_SECONDS: int = 300
+    
+    # Browser/CDN freshness for conditional-GET resources (seconds)
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 60
+    
+    # Serve product listings from the in-memory columnar snapshot (needs numpy)
+    CATALOG_SNAPSHOT_ENABLED: bool = False
+    
+    # How often the similar-products job applies queued catalog changes (seconds)
+    SIMILAR_PRODUCTS_REFRESH_SECONDS: int = 30
 
     class Config:
         env_file = ".env"
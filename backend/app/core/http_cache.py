@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from app.core.config import settings
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps; they are UTC (CURRENT_TIMESTAMP)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    max_age: Optional[int] = None,
+) -> Optional[Response]:
+    """
+    Set validators and Cache-Control on `response`, and answer conditional requests.
+    Returns a 304 response when the client's copy is current; the caller should return it
+    as-is instead of building the body. Returns None when a full response is needed.
+    """
+    if max_age is None:
+        max_age = settings.HTTP_CACHE_MAX_AGE_SECONDS
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, must-revalidate",
+    }
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    elif last_modified is not None and "if-modified-since" in request.headers:
+        # Only consulted when If-None-Match is absent (RFC 9110 13.1.3)
+        try:
+            since = _as_utc(parsedate_to_datetime(request.headers["if-modified-since"]))
+        except (TypeError, ValueError):
+            return None
+        not_modified = last_modified <= since
+    else:
+        not_modified = False
+
+    return Response(status_code=304, headers=headers) if not_modified else None
@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from sqlalchemy import String, and_, literal, or_, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (sort expression, descending) pairs; the last one must be unique (usually the primary key)
+SortOrder = Sequence[Tuple[Any, bool]]
+
+def encode_cursor(key: str, values: Sequence[Any]) -> str:
+    """Pack the sort key of the last row on a page into an opaque token."""
+    packed = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({"k": key, "v": packed}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str, key: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if data["k"] != key:
+            raise ValueError("cursor belongs to a different sort order")
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in data["v"]]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def bind_value(value: Any, dialect: str):
+    # SQLite stores server-default timestamps as "YYYY-MM-DD HH:MM:SS" text; compare
+    # against the same text rather than SQLAlchemy's microsecond format
+    if isinstance(value, datetime) and dialect == "sqlite":
+        fmt = "%Y-%m-%d %H:%M:%S.%f" if value.microsecond else "%Y-%m-%d %H:%M:%S"
+        return literal(value.strftime(fmt), String)
+    return value
+
+def _after(order: SortOrder, values: Sequence[Any], dialect: str):
+    """WHERE clause selecting rows that sort strictly after `values`."""
+    exprs = [expr for expr, _ in order]
+    values = [bind_value(v, dialect) for v in values]
+    directions = {desc for _, desc in order}
+
+    if len(directions) == 1:
+        # Row-value comparison, which both Postgres and SQLite can drive from an index
+        if directions.pop():
+            return tuple_(*exprs) < tuple_(*values)
+        return tuple_(*exprs) > tuple_(*values)
+
+    clauses = []
+    for i, (expr, desc) in enumerate(order):
+        ties = [exprs[j] == values[j] for j in range(i)]
+        clauses.append(and_(*ties, expr < values[i] if desc else expr > values[i]))
+    return or_(*clauses)
+
+def paginate(
+    query,
+    order: SortOrder,
+    *,
+    key: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> list:
+    """
+    Order and page a query.
+    With a cursor, the page starts right after the cursor row using a keyset WHERE, so deep
+    pages cost the same as the first one. Without one, plain skip/limit is used for backwards
+    compatibility. Whenever the page is full, the cursor for the next page is returned in the
+    X-Next-Cursor response header.
+    """
+    query = query.add_columns(*[expr for expr, _ in order]).order_by(
+        *[expr.desc() if desc else expr.asc() for expr, desc in order]
+    )
+
+    if cursor:
+        values = decode_cursor(cursor, key)
+        if len(values) != len(order):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(_after(order, values, query.session.get_bind().dialect.name))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.limit(limit).all()
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key, list(rows[-1][1:]))
+    return [row[0] for row in rows]
@@ -1,12 +1,29 @@
 import redis
+import redis.asyncio
 import os
+from app.core.config import settings
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+
+# Async client for request handlers, so a Redis round-trip doesn't hold a threadpool worker
+async_redis_pool = redis.asyncio.ConnectionPool.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+)
+async_redis_client = redis.asyncio.Redis(connection_pool=async_redis_pool)
+
 # Fallback to fakeredis if connection fails (or just always for this dev env without docker)
 try:
     redis_client.ping()
 except (redis.ConnectionError, ConnectionRefusedError):
     import fakeredis
-    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    import fakeredis.aioredis
+    # One in-memory server behind both clients, so they see the same data
+    _fake_server = fakeredis.FakeServer()
+    redis_client = fakeredis.FakeRedis(server=_fake_server, decode_responses=True)
+    async_redis_client = fakeredis.aioredis.FakeRedis(server=_fake_server, decode_responses=True)
@@ -0,0 +1,33 @@
+import json
+from typing import Any
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the standard library encoder is used without it
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, as sent in response bodies."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class JSONResponse(Response):
+    """Default response class: encodes with orjson when it is installed."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def json_body(response: Response, body: bytes) -> Response:
+    """
+    Send an already encoded JSON body, with the headers the endpoint set on its `response`
+    parameter (FastAPI drops those when an endpoint returns its own Response).
+    """
+    encoded = Response(content=body, status_code=response.status_code or 200, media_type="application/json")
+    encoded.raw_headers.extend(
+        (name, value) for name, value in response.raw_headers
+        if name not in (b"content-length", b"content-type")
+    )
+    return encoded
@@ -1,20 +1,54 @@
 from datetime import datetime, timedelta
-from typing import Optional, Any, Union
-from jose import jwt
+from typing import Optional, Any, Tuple, Union
+from jose import jwt, JWTError
 import bcrypt
+import uuid
 
 from app.core.config import settings
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: Union[str, Any], expires_delta: Optional[timedelta] = None, user_id: Optional[int] = None
+) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode = {"exp": expire, "sub": str(subject)}
+    if user_id is not None:
+        # Lets hot paths (the cart) resolve the user without loading the row
+        to_encode["uid"] = user_id
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_cart_session() -> Tuple[str, str]:
+    """
+    A new anonymous cart id and the signed token that names it, as (session_id, token).
+    The token has no "sub", so it never authenticates a user.
+    """
+    session_id = uuid.uuid4().hex
+    return session_id, jwt.encode({"typ": "cart", "sid": session_id}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def get_cart_session_id(token: str) -> Optional[str]:
+    """The anonymous cart id of a token from create_cart_session, or None if it isn't valid."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("typ") != "cart" or not isinstance(payload.get("sid"), str):
+        return None
+    return payload["sid"]
+
+def get_token_user_id(token: str) -> Optional[int]:
+    """The user id carried by a valid access token, or None (invalid, or issued before tokens carried it)."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None or not isinstance(payload.get("uid"), int):
+        return None
+    return payload["uid"]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
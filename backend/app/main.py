@@ -5,7 +5,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from contextlib import asynccontextmanager
 
-from app.database import engine, Base, get_db
+from app.database import engine, Base, get_db, SessionLocal
+from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.responses import JSONResponse
 
 # Import all models to register them with SQLAlchemy
 from app.models.user import User
@@ -13,9 +16,21 @@ from app.models.product import Product, Category
 from app.models.order import Order, OrderItem
 from app.models.review import Review
 from app.models.wishlist import WishlistItem
+from app.services.ratings import rebuild_rating_summaries
+from app.services.search import ensure_search_index
+from app.services.attributes import ensure_attribute_index, install_attribute_hooks
+from app.services.cart_products import clear_cart_products, invalidate_cart_products
+from app.services.cart_sweeper import start_cart_sweeper
+from app.services.catalog_changes import install_change_hooks, on_catalog_commit
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.category_counts import category_counts
+from app.services.category_tree import ensure_category_tree, install_category_hooks
+from app.services.suggest import suggest_index
+from app.services import bought_together, similar
 
 # Import routers
 from app.routers import auth, product, cart, order, admin, payment, review, wishlist, merchant
+from app.routers.cart import CART_SESSION_HEADER
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -49,6 +64,15 @@ def run_auto_migrations():
                 ("is_featured", "BOOLEAN DEFAULT FALSE"),
                 ("sku", "VARCHAR(50)"),
                 ("merchant_id", "INTEGER REFERENCES users(id)"),
+                ("rating_count", "INTEGER DEFAULT 0"),
+                ("rating_sum", "INTEGER DEFAULT 0"),
+                ("rating_avg", "FLOAT DEFAULT 0"),
+                ("rating_1", "INTEGER DEFAULT 0"),
+                ("rating_2", "INTEGER DEFAULT 0"),
+                ("rating_3", "INTEGER DEFAULT 0"),
+                ("rating_4", "INTEGER DEFAULT 0"),
+                ("rating_5", "INTEGER DEFAULT 0"),
+                ("version", "INTEGER NOT NULL DEFAULT 1"),
             ]
             for col_name, col_def in product_columns:
                 try:
@@ -59,12 +83,23 @@ def run_auto_migrations():
                     migrations.append(f"products.{col_name}")
             
             # Categories table migrations
-            try:
-                db.execute(text("SELECT image_url FROM categories LIMIT 1"))
-            except Exception:
-                db.rollback()
-                db.execute(text("ALTER TABLE categories ADD COLUMN image_url VARCHAR(500)"))
-                migrations.append("categories.image_url")
+            category_columns = [
+                ("image_url", "VARCHAR(500)"),
+                ("version", "INTEGER NOT NULL DEFAULT 1"),
+                ("parent_id", "INTEGER REFERENCES categories(id)"),
+                ("product_count", "INTEGER NOT NULL DEFAULT 0"),
+            ]
+            for col_name, col_def in category_columns:
+                try:
+                    db.execute(text(f"SELECT {col_name} FROM categories LIMIT 1"))
+                except Exception:
+                    db.rollback()
+                    db.execute(text(f"ALTER TABLE categories ADD COLUMN {col_name} {col_def}"))
+                    migrations.append(f"categories.{col_name}")
+            
+            # Backfill rating summaries for existing reviews (after the rollback-based checks above)
+            if "products.rating_avg" in migrations:
+                rebuild_rating_summaries(db)
             
             db.commit()
             if migrations:
@@ -82,7 +117,8 @@ run_auto_migrations()
 app = FastAPI(
     title="Lumina E-Commerce API",
     version="2.0.0",
-    description="Full-featured e-commerce API with multi-role support"
+    description="Full-featured e-commerce API with multi-role support",
+    default_response_class=JSONResponse,
 )
 
 app.add_middleware(
@@ -91,6 +127,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, CART_SESSION_HEADER],
 )
 
 # Prometheus metrics
@@ -192,6 +229,15 @@ def run_auto_migrations(db_session=None):
             ("dimensions", "JSON"),
             ("images", "JSON"),
             ("specifications", "JSON"),
+            ("rating_count", "INTEGER DEFAULT 0"),
+            ("rating_sum", "INTEGER DEFAULT 0"),
+            ("rating_avg", "FLOAT DEFAULT 0"),
+            ("rating_1", "INTEGER DEFAULT 0"),
+            ("rating_2", "INTEGER DEFAULT 0"),
+            ("rating_3", "INTEGER DEFAULT 0"),
+            ("rating_4", "INTEGER DEFAULT 0"),
+            ("rating_5", "INTEGER DEFAULT 0"),
+            ("version", "INTEGER NOT NULL DEFAULT 1"),
         ]
         for col_name, col_def in product_columns:
             if not column_exists("products", col_name):
@@ -202,12 +248,23 @@ def run_auto_migrations(db_session=None):
                      print(f"Error adding {col_name}: {e}")
 
         # Categories table migrations
-        if not column_exists("categories", "image_url"):
-            try:
-                db.execute(text("ALTER TABLE categories ADD COLUMN image_url VARCHAR(500)"))
-                migrations.append("categories.image_url")
-            except Exception as e:
-                print(f"Error adding image_url: {e}")
+        category_columns = [
+            ("image_url", "VARCHAR(500)"),
+            ("version", "INTEGER NOT NULL DEFAULT 1"),
+            ("parent_id", "INTEGER REFERENCES categories(id)"),
+            ("product_count", "INTEGER NOT NULL DEFAULT 0"),
+        ]
+        for col_name, col_def in category_columns:
+            if not column_exists("categories", col_name):
+                try:
+                    db.execute(text(f"ALTER TABLE categories ADD COLUMN {col_name} {col_def}"))
+                    migrations.append(f"categories.{col_name}")
+                except Exception as e:
+                    print(f"Error adding {col_name}: {e}")
+
+        # Backfill rating summaries for existing reviews
+        if "products.rating_avg" in migrations:
+            rebuild_rating_summaries(db)
 
         db.commit()
         
@@ -229,6 +286,45 @@ def run_auto_migrations(db_session=None):
 # Run migrations on startup
 run_auto_migrations()
 
+def create_missing_indexes():
+    """create_all() skips indexes on tables that already exist, so add any new ones here."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"⚠️ Could not create index {index.name}: {e}")
+
+create_missing_indexes()
+
+# Full-text search index (FTS5 on SQLite, tsvector + GIN on Postgres)
+ensure_search_index(engine)
+
+# Specification/tag attribute table, maintained inside product write transactions
+install_attribute_hooks(SessionLocal)
+ensure_attribute_index(engine)
+
+# Category closure table and subtree product counts, maintained the same way
+install_category_hooks(SessionLocal)
+ensure_category_tree(engine)
+
+# In-memory catalog indexes, kept current from session commit hooks
+install_change_hooks(SessionLocal)
+suggest_index.build(engine)
+on_catalog_commit(suggest_index.refresh)
+on_catalog_commit(similar.mark_changed)
+on_catalog_commit(category_counts.invalidate)
+on_catalog_commit(invalidate_cart_products)
+similar.start_similarity_worker(engine, settings.SIMILAR_PRODUCTS_REFRESH_SECONDS)
+bought_together.start_build(engine)
+start_cart_sweeper(
+    settings.CART_SWEEP_INTERVAL_SECONDS, settings.CART_TTL_SECONDS,
+    settings.GUEST_CART_TTL_SECONDS, settings.ABANDONED_CART_AFTER_SECONDS,
+)
+if settings.CATALOG_SNAPSHOT_ENABLED:
+    catalog_snapshot.build(engine)
+    on_catalog_commit(catalog_snapshot.refresh)
+
 
 @app.post("/reset-db")
 def reset_database(db: Session = Depends(get_db)):
@@ -239,6 +335,14 @@ def reset_database(db: Session = Depends(get_db)):
         Base.metadata.drop_all(bind=engine)
         # Recreate all tables
         Base.metadata.create_all(bind=engine)
+        ensure_search_index(engine)
+        suggest_index.build(engine)
+        similar.request_rebuild()
+        bought_together.build(engine)
+        category_counts.invalidate()
+        clear_cart_products()
+        if catalog_snapshot.ready:
+            catalog_snapshot.build(engine)
         return {"message": "Database reset successfully! All tables dropped and recreated."}
     except Exception as e:
         return {"error": str(e)}
@@ -443,7 +547,13 @@ def initial_setup(db: Session = Depends(get_db)):
                     db.add(product)
                     created_items.append(f"Product: {prod_data['name']}")
                 
+        db.flush()
+        rebuild_rating_summaries(db)
         db.commit()
+        # Bulk rating updates bypass the commit hooks
+        suggest_index.build(engine)
+        if catalog_snapshot.ready:
+            catalog_snapshot.build(engine)
         
         return {"message": "Setup completed successfully", "created": created_items}
         
@@ -1,5 +1,5 @@
 from .user import User, UserRole
-from .product import Product, Category
+from .product import Product, Category, CategoryClosure, ProductAttribute
 from .order import Order, OrderItem
 from .review import Review
 from .wishlist import WishlistItem
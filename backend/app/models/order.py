@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, String
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, String, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -15,6 +15,11 @@ class Order(Base):
     
     user = relationship("app.models.user.User", backref="orders")
     items = relationship("OrderItem", back_populates="order")
+    
+    __table_args__ = (
+        # Keyset pagination of the admin order list
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
 class OrderItem(Base):
     __tablename__ = "order_items"
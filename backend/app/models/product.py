@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, JSON, Boolean, Index, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -10,9 +10,32 @@ class Category(Base):
     name = Column(String, unique=True, index=True, nullable=False)
     description = Column(String)
     image_url = Column(String, nullable=True)
+    parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)
+    
+    # Active products in this category and all its descendants (see app.services.category_tree)
+    product_count = Column(Integer, nullable=False, default=0)
+    
+    # Row version, bumped on every UPDATE (used for HTTP ETags)
+    version = Column(Integer, nullable=False, default=1, onupdate=literal_column("categories.version") + 1)
     
     products = relationship("Product", back_populates="category")
 
+class CategoryClosure(Base):
+    """
+    Transitive closure of the category tree: one row per (ancestor, descendant) pair,
+    including each category paired with itself at depth 0. A subtree is then one
+    indexed lookup on ancestor_id, and the ancestors of a category one on descendant_id.
+    """
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "ancestor_id"),
+    )
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -41,18 +64,41 @@ class Product(Base):
     is_featured = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
     
+    # Rating summary (denormalized from reviews, see app.services.ratings)
+    rating_count = Column(Integer, default=0)
+    rating_sum = Column(Integer, default=0)
+    rating_avg = Column(Float, default=0)
+    rating_1 = Column(Integer, default=0)
+    rating_2 = Column(Integer, default=0)
+    rating_3 = Column(Integer, default=0)
+    rating_4 = Column(Integer, default=0)
+    rating_5 = Column(Integer, default=0)
+    
     # Relationships
     category_id = Column(Integer, ForeignKey("categories.id"))
-    merchant_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    merchant_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Row version, bumped on every UPDATE (used for HTTP ETags)
+    version = Column(Integer, nullable=False, default=1, onupdate=literal_column("products.version") + 1)
 
     category = relationship("Category", back_populates="products")
     merchant = relationship("User", back_populates="products", foreign_keys=[merchant_id])
     reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
     wishlist_items = relationship("WishlistItem", back_populates="product", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Serves min_rating filtering and sort_by=rating on the active catalog
+        Index("ix_products_active_rating", "is_active", "rating_avg"),
+        # Keyset pagination for the newest / price sort orders
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        # Incremental catalog exports (updated_since)
+        Index("ix_products_updated_at", "updated_at"),
+    )
+    
     @property
     def discount_percent(self):
         if self.compare_at_price and self.compare_at_price > self.price:
@@ -61,10 +107,32 @@ class Product(Base):
     
     @property
     def average_rating(self):
-        if not self.reviews:
-            return 0
-        return sum(r.rating for r in self.reviews) / len(self.reviews)
+        return self.rating_avg or 0
     
     @property
     def review_count(self):
-        return len(self.reviews) if self.reviews else 0
+        return self.rating_count or 0
+    
+    @property
+    def rating_distribution(self):
+        return {stars: getattr(self, f"rating_{stars}") or 0 for stars in (5, 4, 3, 2, 1)}
+
+class ProductAttribute(Base):
+    """
+    One specification value or tag of a product, extracted from the JSON columns so they
+    can be filtered and counted through an index (kept in sync by app.services.attributes).
+    """
+    __tablename__ = "product_attributes"
+
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False)  # "spec" or "tag"
+    key = Column(String, nullable=False, default="")  # normalized specification name, "" for tags
+    value = Column(String, nullable=False)  # normalized value
+    key_label = Column(String, nullable=True)  # as written, for display
+    value_label = Column(String, nullable=True)
+
+    __table_args__ = (
+        # spec.<key>= / tag= filters and attribute facet counts
+        Index("ix_product_attributes_lookup", "kind", "key", "value", "product_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -24,3 +24,9 @@ class Review(Base):
     # Relationships
     user = relationship("User", back_populates="reviews")
     product = relationship("Product", back_populates="reviews")
+    
+    __table_args__ = (
+        # Keyset pagination, per product and for admin moderation
+        Index("ix_reviews_product_created_at_id", "product_id", "created_at", "id"),
+        Index("ix_reviews_created_at_id", "created_at", "id"),
+    )
@@ -1,15 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import func
-from typing import List, Any
-from app.database import get_db
+from typing import List, Optional
+from app.database import engine, get_db
 from app.models.user import User, UserRole
 from app.models.order import Order
 from app.models.product import Product, Category
 from app.models.review import Review
 from app.models.wishlist import WishlistItem
 from app.core.dependencies import get_current_user
-from app.schemas.user import UserRoleUpdate
+from app.core import cache
+from app.core.config import settings
+from app.core.pagination import paginate
+from app.schemas.order import AdminOrderSummary
+from app.schemas.product import AdminProductSummary, CategoryWithCount
+from app.schemas.review import AdminReviewSummary
+from app.schemas.user import AdminUserSummary, UserRoleUpdate
+from app.schemas.wishlist import AdminWishlistItem
+from app.services.cart_sweeper import cart_memory_report
+from app.services.catalog_export import export_query, export_response
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.category_counts import category_counts
+from app.services.ratings import apply_rating_change, remove_user_ratings
 
 router = APIRouter(
     prefix="/admin",
@@ -61,10 +74,12 @@ def get_admin_dashboard(
     }
 
 # Users
-@router.get("/users", response_model=List[Any])
+@router.get("/users", response_model=List[AdminUserSummary])
 def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     role: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
@@ -75,7 +90,7 @@ def read_users(
     if role:
         query = query.filter(User.role == role)
     
-    users = query.offset(skip).limit(limit).all()
+    users = paginate(query, [(User.id, False)], key="id", response=response, cursor=cursor, skip=skip, limit=limit)
     return [
         {
             "id": u.id, 
@@ -127,26 +142,34 @@ def delete_user(
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
+    # The user's reviews are cascade-deleted with them
+    remove_user_ratings(db, user.id)
     db.delete(user)
     db.commit()
+    cache.invalidate(cache.CATALOG)
     return {"message": "User deleted"}
 
 # Orders
-@router.get("/orders", response_model=List[Any])
+@router.get("/orders", response_model=List[AdminOrderSummary])
 def read_orders(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status_filter: str = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
     """Get all orders with optional status filter."""
-    query = db.query(Order)
+    query = db.query(Order).options(joinedload(Order.user), selectinload(Order.items))
     
     if status_filter:
         query = query.filter(Order.status == status_filter)
     
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    orders = paginate(
+        query, [(Order.created_at, True), (Order.id, True)],
+        key="newest", response=response, cursor=cursor, skip=skip, limit=limit
+    )
     return [
         {
             "id": o.id,
@@ -181,7 +204,7 @@ def update_order_status(
     return {"message": "Order status updated", "order_id": order_id, "status": new_status}
 
 # Products
-@router.get("/products", response_model=List[Any])
+@router.get("/products", response_model=List[AdminProductSummary])
 def read_products(
     skip: int = 0,
     limit: int = 100,
@@ -189,7 +212,7 @@ def read_products(
     current_user: User = Depends(get_current_admin),
 ):
     """Get all products."""
-    products = db.query(Product).offset(skip).limit(limit).all()
+    products = db.query(Product).options(joinedload(Product.category)).offset(skip).limit(limit).all()
     return [
         {
             "id": p.id,
@@ -206,6 +229,20 @@ def read_products(
         for p in products
     ]
 
+@router.get("/products/export")
+def export_products(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    updated_since: Optional[datetime] = None,
+    include_inactive: bool = False,
+    current_user: User = Depends(get_current_admin),
+):
+    """
+    Stream the whole catalog as NDJSON or CSV in constant memory.
+    With updated_since, only products changed since then (deactivated ones included).
+    """
+    query = export_query(engine.dialect.name, updated_since=updated_since, include_inactive=include_inactive)
+    return export_response(engine, format, query, "products")
+
 @router.put("/products/{product_id}/featured")
 def toggle_featured(
     product_id: int,
@@ -220,52 +257,90 @@ def toggle_featured(
     
     product.is_featured = is_featured
     db.commit()
+    cache.invalidate_product(product.id)
     return {"message": "Product updated", "is_featured": is_featured}
 
+@router.get("/catalog-snapshot")
+def get_catalog_snapshot_stats(current_user: User = Depends(get_current_admin)):
+    """Size and memory footprint of the in-memory catalog snapshot."""
+    return {"enabled": catalog_snapshot.ready, **catalog_snapshot.memory_usage()}
+
+@router.get("/carts/memory")
+def get_cart_memory(current_user: User = Depends(get_current_admin)):
+    """
+    Size of the cart keyspace in Redis: carts, lines, bytes, carts still without an expiry,
+    and the stats of the last abandoned-cart sweep.
+    """
+    return cart_memory_report()
+
 # Categories
-@router.get("/categories", response_model=List[Any])
+@router.get("/categories", response_model=List[CategoryWithCount])
 def read_categories(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
-    """Get all categories with product counts."""
-    categories = db.query(Category).all()
-    return [
-        {
-            "id": c.id,
-            "name": c.name,
-            "description": c.description,
-            "image_url": c.image_url,
-            "product_count": len(c.products) if c.products else 0
-        }
-        for c in categories
-    ]
+    """Get all categories with product counts over each one's subtree."""
+    return category_counts.get(db, settings.CATEGORY_COUNTS_TTL_SECONDS)
 
 @router.post("/categories")
 def create_category(
     name: str,
     description: str = None,
     image_url: str = None,
+    parent_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
-    """Create a new category."""
-    category = Category(name=name, description=description, image_url=image_url)
+    """Create a new category, optionally below `parent_id`."""
+    if parent_id is not None and db.get(Category, parent_id) is None:
+        raise HTTPException(status_code=400, detail="Parent category not found")
+    category = Category(name=name, description=description, image_url=image_url, parent_id=parent_id)
     db.add(category)
     db.commit()
+    cache.invalidate(cache.CATEGORIES)
     db.refresh(category)
     return {"message": "Category created", "id": category.id}
 
+@router.put("/categories/{category_id}/parent")
+def move_category(
+    category_id: int,
+    parent_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin),
+):
+    """Move a category, with everything below it, under `parent_id` (or to the top level)."""
+    category = db.get(Category, category_id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    if parent_id is not None and db.get(Category, parent_id) is None:
+        raise HTTPException(status_code=400, detail="Parent category not found")
+    
+    category.parent_id = parent_id
+    try:
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    # Listings filtered on an ancestor now include (or drop) the moved subtree
+    cache.invalidate(cache.CATEGORIES, cache.CATALOG)
+    return {"message": "Category moved", "id": category_id, "parent_id": parent_id}
+
 # Reviews
-@router.get("/reviews", response_model=List[Any])
+@router.get("/reviews", response_model=List[AdminReviewSummary])
 def read_reviews(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
     """Get all reviews for moderation."""
-    reviews = db.query(Review).order_by(Review.created_at.desc()).offset(skip).limit(limit).all()
+    query = db.query(Review).options(joinedload(Review.product), joinedload(Review.user))
+    reviews = paginate(
+        query, [(Review.created_at, True), (Review.id, True)],
+        key="newest", response=response, cursor=cursor, skip=skip, limit=limit
+    )
     return [
         {
             "id": r.id,
@@ -291,8 +366,10 @@ def delete_review(
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
+    apply_rating_change(db, review.product_id, removed=review.rating)
     db.delete(review)
     db.commit()
+    cache.invalidate_product(review.product_id)
     return {"message": "Review deleted"}
 
 # Wishlist Statistics
@@ -336,15 +413,18 @@ def get_wishlist_stats(
         ]
     }
 
-@router.get("/wishlist-items", response_model=List[Any])
+@router.get("/wishlist-items", response_model=List[AdminWishlistItem])
 def get_all_wishlist_items(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin),
 ):
     """Get all wishlist items for admin view."""
-    items = db.query(WishlistItem).offset(skip).limit(limit).all()
+    query = db.query(WishlistItem).options(joinedload(WishlistItem.user), joinedload(WishlistItem.product))
+    items = paginate(query, [(WishlistItem.id, False)], key="id", response=response, cursor=cursor, skip=skip, limit=limit)
     return [
         {
             "id": w.id,
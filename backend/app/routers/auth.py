@@ -1,5 +1,6 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+import redis
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
@@ -9,6 +10,8 @@ from app.schemas.user import UserCreate, UserResponse, Token, MerchantCreate
 from app.core import security
 from app.core.config import settings
 from app.core.dependencies import get_current_user
+from app.routers.cart import CART_SESSION_HEADER, get_cart_key, get_guest_cart_key
+from app.services.cart_store import merge_carts
 
 router = APIRouter(tags=["Authentication"])
 
@@ -53,8 +56,12 @@ def create_merchant(merchant: MerchantCreate, db: Session = Depends(database.get
     return new_user
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    """Login and get access token with user info."""
+def login_for_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(database.get_db),
+):
+    """Login and get access token with user info. An anonymous cart sent in X-Cart-Session is merged into the user's."""
     user = db.query(User).filter(User.email == form_data.username).first()
     
     if not user:
@@ -73,9 +80,17 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    guest_session = security.get_cart_session_id(request.headers.get(CART_SESSION_HEADER, ""))
+    if guest_session is not None:
+        try:
+            merge_carts(get_guest_cart_key(guest_session), get_cart_key(user.id), settings.CART_TTL_SECONDS)
+        except redis.RedisError as e:
+            # Logging in matters more than keeping the anonymous cart
+            print(f"⚠️ Could not merge guest cart: {e}")
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, user_id=user.id
     )
     
     return {
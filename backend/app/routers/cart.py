@@ -1,102 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from app.core.redis import redis_client
-from app.schemas.order import CartItem, Cart
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, NamedTuple, Optional
+from app.core.redis import async_redis_client
+from app.schemas.order import CartItem, Cart, CartOperations
 from app.schemas.user import UserResponse
 from app.core import security
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from app.core.config import settings
-from app import database
-from sqlalchemy.orm import Session
-from app.models.user import User
+from app.database import SessionLocal
+from app.services.cart_store import CartError, apply_cart_changes, change_cart, read_cart
 
 router = APIRouter(tags=["Cart"])
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# Signed anonymous cart token: returned by the first cart change without a login, sent back on
+# later cart requests and on login (to merge the cart into the user's)
+CART_SESSION_HEADER = "X-Cart-Session"
 
-def get_current_user_optional(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    # This is a bit simplified; in real app we might allow guest carts via session ID
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-    except JWTError:
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+from app.core.dependencies import get_current_user
+
+def _user_id(token: str) -> int:
+    with SessionLocal() as db:
+        return get_current_user(token, db).id
+
+async def get_current_user_id_optional(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[int]:
+    """The logged-in user's id, or None without a bearer token (a token that is sent must be valid)."""
+    if not token:
         return None
-    
-    user = db.query(User).filter(User.email == email).first()
-    return user
+    # Tokens from login carry the id, so a cart request never touches the database
+    user_id = security.get_token_user_id(token)
+    if user_id is not None:
+        return user_id
+    # Older tokens (and invalid ones, which this rejects) go through the user lookup, off the event loop
+    return await run_in_threadpool(_user_id, token)
 
 def get_cart_key(user_id: int):
     return f"cart:{user_id}"
 
-from app.core.dependencies import get_current_user
+def get_guest_cart_key(session_id: str):
+    return f"cart:guest:{session_id}"
 
-@router.post("/cart/add")
-def add_to_cart(item: CartItem, user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    cart_key = get_cart_key(user.id)
-    # HINCRBY increments the quantity of the product_id field in the hash stored at key
-    redis_client.hincrby(cart_key, str(item.product_id), item.quantity)
-    return {"message": "Item added to cart"}
+class CartOwner(NamedTuple):
+    key: str
+    ttl: int  # seconds of inactivity before the cart expires
+
+def _cart_owner(create: bool):
+    async def dependency(
+        request: Request,
+        response: Response,
+        user_id: Optional[int] = Depends(get_current_user_id_optional),
+    ) -> Optional[CartOwner]:
+        if user_id is not None:
+            return CartOwner(get_cart_key(user_id), settings.CART_TTL_SECONDS)
+        # Anonymous carts only need the token's signature checked, not the users table
+        session_id = security.get_cart_session_id(request.headers.get(CART_SESSION_HEADER, ""))
+        if session_id is None:
+            if not create:
+                return None
+            session_id, token = security.create_cart_session()
+            response.headers[CART_SESSION_HEADER] = token
+        return CartOwner(get_guest_cart_key(session_id), settings.GUEST_CART_TTL_SECONDS)
+    return dependency
 
-from app.models.product import Product
+# Reads and clears don't start an anonymous cart; changes do
+cart_reader = _cart_owner(create=False)
+cart_writer = _cart_owner(create=True)
+
+async def _change(owner: CartOwner, mode: str, product_id: int, quantity: int = 0) -> dict:
+    try:
+        return await change_cart(
+            owner.key, mode, product_id, quantity, settings.CART_PRODUCT_CACHE_TTL_SECONDS, owner.ttl
+        )
+    except CartError as e:
+        if e.status == "missing":
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(status_code=400, detail="Product is not available")
+
+@router.post("/cart/add")
+async def add_to_cart(item: CartItem, owner: CartOwner = Depends(cart_writer)):
+    """Add to an item's quantity, up to the stock available. Returns the updated cart."""
+    cart = await _change(owner, "add", item.product_id, item.quantity)
+    message = f"Only {cart['quantity']} available" if cart["clamped"] else "Item added to cart"
+    return {"message": message, **cart}
 
 @router.get("/cart/")
-def get_cart(user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    cart_key = get_cart_key(user.id)
-    items = redis_client.hgetall(cart_key)
-    # items is { "product_id": "quantity", ... }
-    
-    if not items:
+async def get_cart(owner: Optional[CartOwner] = Depends(cart_reader)):
+    if owner is None:
         return {"items": [], "total_amount": 0.0}
-
-    cart_items = []
-    total_amount = 0.0
-
-    # Batch fetch products could be optimized, but loop is fine for small carts
-    for pid_str, qty_str in items.items():
-        pid = int(pid_str)
-        qty = int(qty_str)
-        
-        product = db.query(Product).filter(Product.id == pid).first()
-        if product:
-            item_total = product.price * qty
-            total_amount += item_total
-            cart_items.append({
-                "product_id": pid,
-                "name": product.name,
-                "price": product.price,
-                "image_url": product.image_url,
-                "quantity": qty
-            })
-    
-    return {"items": cart_items, "total_amount": total_amount}
+    return await read_cart(owner.key, settings.CART_PRODUCT_CACHE_TTL_SECONDS, owner.ttl)
 
 @router.delete("/cart/clear")
-def clear_cart(user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-
-    cart_key = get_cart_key(user.id)
-    redis_client.delete(cart_key)
+async def clear_cart(owner: Optional[CartOwner] = Depends(cart_reader)):
+    if owner is not None:
+        await async_redis_client.delete(owner.key)
     return {"message": "Cart cleared"}
 
 @router.put("/cart/update")
-def update_cart_item(item: CartItem, user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
-    """Update the quantity of an item in the cart. Set quantity to 0 to remove."""
-    cart_key = get_cart_key(user.id)
-    
+async def update_cart_item(item: CartItem, owner: CartOwner = Depends(cart_writer)):
+    """Update the quantity of an item in the cart, up to the stock available. Set quantity to 0 to remove."""
     if item.quantity <= 0:
         # Remove item if quantity is 0 or negative
-        redis_client.hdel(cart_key, str(item.product_id))
-        return {"message": "Item removed from cart"}
+        return {"message": "Item removed from cart", **(await _change(owner, "remove", item.product_id))}
     else:
         # Set the new quantity
-        redis_client.hset(cart_key, str(item.product_id), item.quantity)
-        return {"message": "Cart updated"}
+        cart = await _change(owner, "set", item.product_id, item.quantity)
+        message = f"Only {cart['quantity']} available" if cart["clamped"] else "Cart updated"
+        return {"message": message, **cart}
+
+@router.patch("/cart/items")
+async def update_cart_items(batch: CartOperations, owner: CartOwner = Depends(cart_writer)):
+    """
+    Apply add, set and remove operations in order, atomically and in one Redis call (re-orders,
+    moving a wishlist, restoring a saved cart). Quantities are capped at stock; operations on
+    unknown or inactive products are skipped and reported. Returns each operation's outcome
+    and the updated cart.
+    """
+    changes = [
+        ("remove" if operation.op == "set" and operation.quantity <= 0 else operation.op,
+         operation.product_id, operation.quantity)
+        for operation in batch.operations
+    ]
+    results, cart = await apply_cart_changes(
+        owner.key, changes, settings.CART_PRODUCT_CACHE_TTL_SECONDS, owner.ttl
+    )
+    return {
+        "results": [
+            {"op": operation.op, "product_id": operation.product_id, **result}
+            for operation, result in zip(batch.operations, results)
+        ],
+        **cart,
+    }
 
 @router.delete("/cart/remove/{product_id}")
-def remove_from_cart(product_id: int, user: User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def remove_from_cart(product_id: int, owner: Optional[CartOwner] = Depends(cart_reader)):
     """Remove a specific item from the cart."""
-    cart_key = get_cart_key(user.id)
-    redis_client.hdel(cart_key, str(product_id))
-    return {"message": "Item removed from cart"}
+    if owner is None:
+        return {"message": "Item removed from cart", "quantity": 0, "clamped": False, "items": [], "total_amount": 0.0}
+    return {"message": "Item removed from cart", **(await _change(owner, "remove", product_id))}
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Any
-from app.database import get_db
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
+from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
+from typing import List, Optional
+from app.database import engine, get_db
 from app.models.user import User, UserRole
 from app.models.product import Product, Category
 from app.models.order import Order, OrderItem
 from app.core.dependencies import get_current_user
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
+from app.core import cache
+from app.core.pagination import paginate
+from app.schemas.order import MerchantOrder
+from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, MerchantProductSummary
+from app.services.catalog_export import export_query, export_response
+from app.services.product_import import detect_format, import_products
 import uuid
 
 router = APIRouter(
@@ -54,17 +60,20 @@ def get_merchant_dashboard(
         "low_stock_products": len([p for p in products if p.stock < 10])
     }
 
-@router.get("/products", response_model=List[Any])
+@router.get("/products", response_model=List[MerchantProductSummary])
 def get_merchant_products(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_merchant)
 ):
     """Get all products owned by the merchant."""
-    products = db.query(Product).filter(
+    query = db.query(Product).options(joinedload(Product.category)).filter(
         Product.merchant_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    )
+    products = paginate(query, [(Product.id, False)], key="id", response=response, cursor=cursor, skip=skip, limit=limit)
     
     return [
         {
@@ -101,9 +110,38 @@ def create_merchant_product(
     db.add(new_product)
     db.commit()
     db.refresh(new_product)
+    cache.invalidate_product()
     
     return new_product
 
+@router.post("/products/import")
+def import_merchant_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_merchant)
+):
+    """
+    Bulk create or update products from a CSV or NDJSON file, matched on SKU.
+    Returns counts and per-row errors; valid rows are saved even when others fail.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format, pass format=csv or format=ndjson")
+    
+    return import_products(db, current_user.id, file.file, fmt)
+
+@router.get("/products/export")
+def export_merchant_products(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    updated_since: Optional[datetime] = None,
+    include_inactive: bool = False,
+    current_user: User = Depends(get_current_merchant)
+):
+    """Stream the merchant's products as NDJSON or CSV, in the format the import accepts."""
+    query = export_query(engine.dialect.name, updated_since=updated_since, merchant_id=current_user.id, include_inactive=include_inactive)
+    return export_response(engine, format, query, "products")
+
 @router.put("/products/{product_id}", response_model=ProductResponse)
 def update_merchant_product(
     product_id: int,
@@ -125,6 +163,7 @@ def update_merchant_product(
     
     db.commit()
     db.refresh(product)
+    cache.invalidate_product(product.id)
     
     return product
 
@@ -146,10 +185,11 @@ def delete_merchant_product(
     # Soft delete - mark as inactive
     product.is_active = False
     db.commit()
+    cache.invalidate_product(product.id)
     
     return {"message": "Product deleted"}
 
-@router.get("/orders")
+@router.get("/orders", response_model=List[MerchantOrder])
 def get_merchant_orders(
     skip: int = 0,
     limit: int = 50,
@@ -10,6 +10,8 @@ from app.models.user import User
 from app.schemas.order import OrderResponse
 from app.routers.cart import router as cart_router, get_cart_key
 from app.core.redis import redis_client
+from app.core import cache
+from app.services.bought_together import record_order
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from app.core.config import settings
@@ -100,9 +102,12 @@ def checkout(
 
     db.commit()
     db.refresh(new_order)
+    record_order(item["product"].id for item in items_to_add)
     
     # Clear cart
     redis_client.delete(cart_key)
+    # Stock changed on the purchased products: their detail pages and the listings that show stock
+    cache.invalidate(cache.CATALOG, *[cache.product_namespace(int(pid)) for pid in cart_items_raw])
     
     # We construct the response manually to match schema slightly easier or rely on ORM
     # The ORM relationships (items) should populate.
@@ -166,7 +171,9 @@ def checkout_demo(
 
     db.commit()
     db.refresh(new_order)
+    record_order(item["product"].id for item in items_to_add)
     
     redis_client.delete(cart_key)
+    cache.invalidate(cache.CATALOG, *[cache.product_namespace(int(pid)) for pid in cart_items_raw])
     
     return new_order
@@ -1,33 +1,125 @@
-from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session, joinedload, load_only
 from sqlalchemy import func
 
 from app import database
+from app.core import cache
+from app.core.config import settings
+from app.core.http_cache import conditional_get
+from app.core.pagination import paginate
 from app.models.product import Product, Category
-from app.models.review import Review
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate, CategoryCreate, Category as CategorySchema
+from app.schemas.product import (
+    ProductCreate, ProductResponse, ProductUpdate, CategoryCreate, ProductFilter, ProductBatchRequest,
+    ProductBatchResponse, ProductListItem, ProductSummary, SimilarProduct, BoughtTogetherProduct,
+    ProductSuggestion, ProductFacets, Category as CategorySchema, CategoryWithCount,
+)
+from app.services.attributes import attribute_product_ids, normalize as normalize_attribute
+from app.services.bought_together import bought_together
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.category_counts import category_counts
+from app.services.category_tree import subtree_ids
+from app.services.facets import count_facets
+from app.services.search import apply_search
+from app.services.similar import TOP_K, get_similar
+from app.services.suggest import MAX_SUGGESTIONS, suggest_index
 
 router = APIRouter(tags=["Products"])
 
+# Most products one batch lookup may ask for
+MAX_BATCH_IDS = 500
+
+# Keyset sort orders for the product listing; each ends on the primary key to stay unique.
+# Keep in step with SNAPSHOT_SORTS in app.services.catalog_snapshot.
+PRODUCT_SORTS = {
+    "price_asc": [(Product.price, False), (Product.id, False)],
+    "price_desc": [(Product.price, True), (Product.id, True)],
+    "newest": [(Product.created_at, True), (Product.id, True)],
+    "name": [(Product.name, False), (Product.id, False)],
+    "rating": [(Product.rating_avg, True), (Product.rating_count, True), (Product.id, True)],
+}
+
+# Fields of the product listing: the columns each one needs, and how it is serialized
+LISTING_FIELDS = {
+    "id": ((Product.id,), lambda p: p.id),
+    "name": ((Product.name,), lambda p: p.name),
+    "description": ((Product.description,), lambda p: p.description),
+    "price": ((Product.price,), lambda p: p.price),
+    "compare_at_price": ((Product.compare_at_price,), lambda p: p.compare_at_price),
+    "stock": ((Product.stock,), lambda p: p.stock),
+    "brand": ((Product.brand,), lambda p: p.brand),
+    "sku": ((Product.sku,), lambda p: p.sku),
+    "image_url": ((Product.image_url,), lambda p: p.image_url),
+    "images": ((Product.images,), lambda p: p.images),
+    "specifications": ((Product.specifications,), lambda p: p.specifications),
+    "tags": ((Product.tags,), lambda p: p.tags),
+    "is_featured": ((Product.is_featured,), lambda p: p.is_featured),
+    "is_active": ((Product.is_active,), lambda p: p.is_active),
+    "category_id": ((Product.category_id,), lambda p: p.category_id),
+    "merchant_id": ((Product.merchant_id,), lambda p: p.merchant_id),
+    "average_rating": ((Product.rating_avg,), lambda p: round(p.average_rating, 1)),
+    "review_count": ((Product.rating_count,), lambda p: p.review_count),
+    "discount_percent": ((Product.price, Product.compare_at_price), lambda p: p.discount_percent),
+    "created_at": ((Product.created_at,), lambda p: p.created_at),
+    "updated_at": ((Product.updated_at,), lambda p: p.updated_at),
+    "category": ((Product.category_id,), lambda p: p.category),
+}
+
+# Named projections for the listing; "full" is the default
+LISTING_VIEWS = {
+    "full": list(LISTING_FIELDS),
+    "card": ["id", "name", "price", "compare_at_price", "discount_percent", "image_url", "brand", "average_rating", "review_count"],
+}
+
 # --- Categories ---
 @router.post("/categories/", response_model=CategorySchema)
 def create_category(category: CategoryCreate, db: Session = Depends(database.get_db)):
+    if category.parent_id is not None and db.get(Category, category.parent_id) is None:
+        raise HTTPException(status_code=400, detail="Parent category not found")
     db_category = Category(**category.dict())
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    cache.invalidate(cache.CATEGORIES)
     return db_category
 
-@router.get("/categories/", response_model=List[CategorySchema])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return db.query(Category).offset(skip).limit(limit).all()
+@router.get("/categories/", response_model=Union[List[CategoryWithCount], List[CategorySchema]])
+def read_categories(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    with_counts: bool = False,
+    db: Session = Depends(database.get_db),
+):
+    """Categories, optionally with product counts over each one's subtree."""
+    if with_counts:
+        # Counts change with every product write, so they come from their own in-process cache
+        return category_counts.get(db, settings.CATEGORY_COUNTS_TTL_SECONDS)[skip:skip + limit]
+    
+    # Any insert, delete or update changes the count, the highest id or the version sum
+    count, max_id, versions = db.query(
+        func.count(Category.id), func.max(Category.id), func.sum(Category.version)
+    ).one()
+    not_modified = conditional_get(request, response, f'"c{count}.{max_id or 0}.{versions or 0}.{skip}.{limit}"')
+    if not_modified:
+        return not_modified
+    
+    return cache.cached_response(
+        response, cache.CATEGORIES, "categories", {"skip": skip, "limit": limit},
+        settings.CATEGORY_CACHE_TTL_SECONDS,
+        lambda: db.query(Category).offset(skip).limit(limit).all(),
+        List[CategorySchema],
+    )
 
 @router.get("/categories/{category_id}", response_model=CategorySchema)
-def read_category(category_id: int, db: Session = Depends(database.get_db)):
+def read_category(category_id: int, request: Request, response: Response, db: Session = Depends(database.get_db)):
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    not_modified = conditional_get(request, response, f'"c{category.id}-{category.version}"')
+    if not_modified:
+        return not_modified
     return category
 
 # --- Products ---
@@ -37,12 +129,11 @@ def create_product(product: ProductCreate, db: Session = Depends(database.get_db
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    cache.invalidate_product()
     return db_product
 
-@router.get("/products/", response_model=List[Any])
-def read_products(
-    skip: int = 0, 
-    limit: int = 100, 
+def product_filters(
+    request: Request,
     search: Optional[str] = Query(None, min_length=1, description="Search products by name or description"),
     category_id: Optional[int] = None,
     brand: Optional[str] = None,
@@ -51,113 +142,299 @@ def read_products(
     min_rating: Optional[float] = None,
     in_stock: Optional[bool] = None,
     is_featured: Optional[bool] = None,
-    sort_by: Optional[str] = Query(None, description="Sort by: price_asc, price_desc, rating, newest, name"),
-    db: Session = Depends(database.get_db)
-):
-    """Get products with advanced filtering."""
-    query = db.query(Product).filter(Product.is_active == True)
+    tag: Optional[List[str]] = Query(None, description="Only products with this tag; repeat to require several"),
+) -> ProductFilter:
+    """
+    Filter query parameters shared by the product listing and its facets.
+    Specification filters are dynamic: spec.<key>=<value>, repeated for alternatives.
+    """
+    specs = {}
+    for name, value in request.query_params.multi_items():
+        if name.startswith("spec.") and len(name) > 5 and value:
+            specs.setdefault(name[5:], []).append(value)
+    return ProductFilter(
+        search=search,
+        category_id=category_id,
+        brand=brand,
+        min_price=min_price,
+        max_price=max_price,
+        min_rating=min_rating,
+        in_stock=in_stock,
+        is_featured=is_featured,
+        specs=specs or None,
+        tags=tag or None,
+    )
+
+def listing_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,price"),
+    view: str = Query("full", description="Named field set: full or card; ignored when fields is given"),
+) -> List[str]:
+    """Resolve the listing's sparse fieldset from `fields` or `view`."""
+    if fields:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in LISTING_FIELDS]
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown) or '(none given)'}. Available: {', '.join(LISTING_FIELDS)}",
+            )
+        return names
+    if view not in LISTING_VIEWS:
+        raise HTTPException(status_code=400, detail=f"Unknown view {view!r}. Available: {', '.join(LISTING_VIEWS)}")
+    return LISTING_VIEWS[view]
+
+def apply_product_filters(query, filters: ProductFilter):
+    """Restrict a Product query to active products matching `filters`. Returns (query, relevance)."""
+    query = query.filter(Product.is_active == True)
     
-    # Category filter
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
+    # Category filter: the category and everything below it
+    if filters.category_id:
+        query = query.filter(Product.category_id.in_(subtree_ids(filters.category_id)))
     
     # Brand filter
-    if brand:
-        query = query.filter(Product.brand.ilike(f"%{brand}%"))
-    
-    # Search
-    if search:
-        search_fmt = f"%{search}%"
-        query = query.filter(
-            Product.name.ilike(search_fmt) | 
-            Product.description.ilike(search_fmt) |
-            Product.brand.ilike(search_fmt)
-        )
+    if filters.brand:
+        query = query.filter(Product.brand.ilike(f"%{filters.brand}%"))
+    
+    # Search (full-text index, ranked by relevance)
+    relevance = None
+    if filters.search:
+        query, relevance = apply_search(query, filters.search)
     
     # Price filters
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
+    if filters.min_price is not None:
+        query = query.filter(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(Product.price <= filters.max_price)
     
     # Stock filter
-    if in_stock:
+    if filters.in_stock:
         query = query.filter(Product.stock > 0)
     
+    # Specification and tag filters (product_attributes index)
+    for key, values in (filters.specs or {}).items():
+        query = query.filter(Product.id.in_(attribute_product_ids("spec", key, values)))
+    for tag in filters.tags or []:
+        query = query.filter(Product.id.in_(attribute_product_ids("tag", "", [tag])))
+    
     # Featured filter
-    if is_featured:
+    if filters.is_featured:
         query = query.filter(Product.is_featured == True)
     
-    # Sorting
-    if sort_by == "price_asc":
-        query = query.order_by(Product.price.asc())
-    elif sort_by == "price_desc":
-        query = query.order_by(Product.price.desc())
-    elif sort_by == "newest":
-        query = query.order_by(Product.created_at.desc())
-    elif sort_by == "name":
-        query = query.order_by(Product.name.asc())
-    else:
-        query = query.order_by(Product.created_at.desc())
+    # Rating filter (stored summary, indexed)
+    if filters.min_rating is not None:
+        query = query.filter(Product.rating_avg >= filters.min_rating)
     
-    products = query.offset(skip).limit(limit).all()
+    return query, relevance
+
+def filter_cache_params(filters: ProductFilter) -> dict:
+    """Filter values for cache keys; text filters are case-insensitive, so fold case."""
+    params = filters.dict(exclude={"sort_by"})
+    for field in ("search", "brand"):
+        if params[field]:
+            params[field] = params[field].strip().lower()
+    if params["specs"]:
+        params["specs"] = {
+            normalize_attribute(key): sorted({normalize_attribute(v) for v in values})
+            for key, values in params["specs"].items()
+        }
+    if params["tags"]:
+        params["tags"] = sorted({normalize_attribute(tag) for tag in params["tags"]})
+    return params
+
+@router.get("/products/", response_model=List[ProductListItem], response_model_exclude_unset=True)
+def read_products(
+    response: Response,
+    skip: int = 0, 
+    limit: int = 100, 
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header; replaces skip"),
+    sort_by: Optional[str] = Query(None, description="Sort by: relevance, price_asc, price_desc, rating, newest, name"),
+    filters: ProductFilter = Depends(product_filters),
+    fields: List[str] = Depends(listing_fields),
+    db: Session = Depends(database.get_db)
+):
+    """Get products with advanced filtering."""
+    params = {
+        "skip": skip, "limit": limit, "cursor": cursor, "sort_by": sort_by, "fields": ",".join(fields),
+        **filter_cache_params(filters),
+    }
+    return cache.cached_response(
+        response, cache.CATALOG, "products", params, settings.CATALOG_CACHE_TTL_SECONDS,
+        lambda: list_products(response, skip, limit, cursor, sort_by, filters, fields, db),
+        List[ProductListItem], exclude_unset=True,
+    )
+
+def list_products(
+    response: Response,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    sort_by: Optional[str],
+    filters: ProductFilter,
+    fields: List[str],
+    db: Session,
+):
+    # Only SELECT the columns behind the requested fields
+    columns = {column for name in fields for column in LISTING_FIELDS[name][0]}
+    query = db.query(Product).options(load_only(*columns))
+    if "category" in fields:
+        query = query.options(joinedload(Product.category).load_only(Category.id, Category.name))
     
-    # Build response with computed fields
-    result = []
-    for p in products:
-        # Calculate average rating
-        reviews = db.query(Review).filter(Review.product_id == p.id).all()
-        avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
-        review_count = len(reviews)
-        
-        # Filter by rating if specified
-        if min_rating is not None and avg_rating < min_rating:
-            continue
+    # Filter and sort in memory when the snapshot can, then load just that page
+    sort_key = sort_by if sort_by in PRODUCT_SORTS else "newest"
+    if catalog_snapshot.can_serve(filters, sort_key):
+        ids = catalog_snapshot.page(filters, sort_key, response=response, cursor=cursor, skip=skip, limit=limit)
+        products = products_in_order(query, ids)
+    else:
+        query, relevance = apply_product_filters(query, filters)
         
-        discount = 0
-        if p.compare_at_price and p.compare_at_price > p.price:
-            discount = round((1 - p.price / p.compare_at_price) * 100)
+        # Sorting
+        if sort_by in PRODUCT_SORTS:
+            sort_key, order = sort_by, PRODUCT_SORTS[sort_by]
+        elif relevance is not None:
+            # Searches default to best match first
+            sort_key, order = "relevance", [(relevance, False), (Product.id, True)]
+        else:
+            sort_key, order = "newest", PRODUCT_SORTS["newest"]
         
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "description": p.description,
-            "price": p.price,
-            "compare_at_price": p.compare_at_price,
-            "stock": p.stock,
-            "brand": p.brand,
-            "sku": p.sku,
-            "image_url": p.image_url,
-            "images": p.images,
-            "specifications": p.specifications,
-            "tags": p.tags,
-            "is_featured": p.is_featured,
-            "is_active": p.is_active,
-            "category_id": p.category_id,
-            "merchant_id": p.merchant_id,
-            "average_rating": round(avg_rating, 1),
-            "review_count": review_count,
-            "discount_percent": discount,
-            "created_at": p.created_at,
-            "updated_at": p.updated_at,
-            "category": {"id": p.category.id, "name": p.category.name} if p.category else None
-        })
+        products = paginate(query, order, key=sort_key, response=response, cursor=cursor, skip=skip, limit=limit)
     
-    return result
+    serializers = [(name, LISTING_FIELDS[name][1]) for name in fields]
+    return [{name: serialize(p) for name, serialize in serializers} for p in products]
 
-@router.get("/products/featured", response_model=List[Any])
-def get_featured_products(limit: int = 10, db: Session = Depends(database.get_db)):
+@router.get("/products/featured", response_model=List[ProductSummary])
+def get_featured_products(response: Response, limit: int = 10, db: Session = Depends(database.get_db)):
     """Get featured products."""
-    products = db.query(Product).filter(
+    return cache.cached_response(
+        response, cache.CATALOG, "featured", {"limit": limit}, settings.CATALOG_CACHE_TTL_SECONDS,
+        lambda: list_featured_products(limit, db),
+        List[ProductSummary],
+    )
+
+def list_featured_products(limit: int, db: Session) -> List[Product]:
+    return db.query(Product).filter(
         Product.is_featured == True,
         Product.is_active == True
     ).limit(limit).all()
+
+@router.get("/products/brands", response_model=List[str])
+def get_all_brands(response: Response, db: Session = Depends(database.get_db)):
+    """Get all unique brand names for filter."""
+    def build():
+        brands = db.query(Product.brand).filter(
+            Product.brand.isnot(None),
+            Product.is_active == True
+        ).distinct().all()
+        return [b[0] for b in brands if b[0]]
+    
+    return cache.cached_response(
+        response, cache.CATALOG, "brands", {}, settings.CATALOG_CACHE_TTL_SECONDS, build, List[str],
+    )
+
+@router.get("/products/suggest", response_model=List[ProductSuggestion], response_model_exclude_none=True)
+def suggest_products(q: str = Query(..., min_length=1), limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)):
+    """Typeahead: products, brands and categories whose name has a word starting with `q`, most popular first."""
+    return suggest_index.suggest(q, limit)
+
+@router.get("/products/facets", response_model=ProductFacets)
+def get_product_facets(
+    response: Response,
+    filters: ProductFilter = Depends(product_filters),
+    db: Session = Depends(database.get_db)
+):
+    """Brand, category, price range and availability counts for the current filters."""
+    query, _ = apply_product_filters(db.query(Product), filters)
+    return cache.cached_response(
+        response, cache.CATALOG, "facets", filter_cache_params(filters), settings.CATALOG_CACHE_TTL_SECONDS,
+        lambda: count_facets(query),
+        ProductFacets,
+    )
+
+def products_in_order(query, ids: List[int]) -> List[Product]:
+    """Load products by id with one IN query, in the order of `ids`; unknown ids are skipped."""
+    if not ids:
+        return []
+    by_id = {p.id: p for p in query.filter(Product.id.in_(ids)).all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+def batch_products(ids: List[int], db: Session) -> dict:
+    ids = list(dict.fromkeys(ids))  # drop repeats, keep order
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    products = products_in_order(db.query(Product).options(joinedload(Product.category)), ids)
+    found = {p.id for p in products}
+    return {"products": products, "missing": [i for i in ids if i not in found]}
+
+@router.get("/products/batch", response_model=ProductBatchResponse)
+def read_products_batch(
+    ids: str = Query(..., description="Comma-separated product ids, e.g. 3,1,2"),
+    db: Session = Depends(database.get_db)
+):
+    """Several products in one request, in the order asked for, plus the ids that don't exist."""
+    try:
+        product_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    return batch_products(product_ids, db)
+
+@router.post("/products/batch", response_model=ProductBatchResponse)
+def read_products_batch_post(batch: ProductBatchRequest, db: Session = Depends(database.get_db)):
+    """Same as GET /products/batch, for id lists too long for a URL."""
+    return batch_products(batch.ids, db)
+
+@router.get("/products/{product_id}", response_model=ProductResponse)
+def read_product(product_id: int, request: Request, response: Response, db: Session = Depends(database.get_db)):
+    # Revalidation only needs the row versions, not the product body
+    versions = db.query(
+        Product.version, Product.updated_at, Product.created_at, Category.version
+    ).outerjoin(Category, Category.id == Product.category_id).filter(Product.id == product_id).first()
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    version, updated_at, created_at, category_version = versions
+    row_versions = f"{version}.{category_version or 0}"
+    not_modified = conditional_get(request, response, f'"p{product_id}-{row_versions}"', updated_at or created_at)
+    if not_modified:
+        return not_modified
+    
+    # Keyed on the same versions as the ETag: a category change (which doesn't clear this
+    # product's namespace) bumps the category version and so misses the stale body
+    return cache.cached_response(
+        response, cache.product_namespace(product_id), "product", {"id": product_id, "versions": row_versions},
+        settings.PRODUCT_CACHE_TTL_SECONDS,
+        lambda: product_detail(product_id, db),
+        ProductResponse,
+    )
+
+def product_detail(product_id: int, db: Session) -> Product:
+    product = db.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.get("/products/{product_id}/similar", response_model=List[SimilarProduct])
+def get_similar_products(product_id: int, limit: int = Query(8, ge=1, le=TOP_K), db: Session = Depends(database.get_db)):
+    """Products with the most tags, specifications and brand in common, from the same category."""
+    product = db.query(Product.id, Product.category_id).filter(Product.id == product_id).first()
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    neighbours = get_similar(product_id)
+    if not neighbours:
+        return []
+    # Stored lists can lag behind edits; skip anything deactivated or moved since
+    products = {
+        p.id: p for p in db.query(Product).filter(
+            Product.id.in_([neighbour_id for neighbour_id, _ in neighbours]),
+            Product.is_active == True,
+            Product.category_id == product.category_id,
+        )
+    }
     
     result = []
-    for p in products:
-        reviews = db.query(Review).filter(Review.product_id == p.id).all()
-        avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
-        
+    for neighbour_id, score in neighbours:
+        p = products.get(neighbour_id)
+        if p is None:
+            continue
         result.append({
             "id": p.id,
             "name": p.name,
@@ -165,60 +442,46 @@ def get_featured_products(limit: int = 10, db: Session = Depends(database.get_db
             "compare_at_price": p.compare_at_price,
             "image_url": p.image_url,
             "brand": p.brand,
-            "average_rating": round(avg_rating, 1),
-            "review_count": len(reviews)
+            "average_rating": round(p.average_rating, 1),
+            "review_count": p.review_count,
+            "similarity": score
         })
-    
-    return result
+    return result[:limit]
 
-@router.get("/products/brands")
-def get_all_brands(db: Session = Depends(database.get_db)):
-    """Get all unique brand names for filter."""
-    brands = db.query(Product.brand).filter(
-        Product.brand.isnot(None),
-        Product.is_active == True
-    ).distinct().all()
-    return [b[0] for b in brands if b[0]]
-
-@router.get("/products/{product_id}", response_model=Any)
-def read_product(product_id: int, db: Session = Depends(database.get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if product is None:
+@router.get("/products/{product_id}/bought-together", response_model=List[BoughtTogetherProduct])
+def get_bought_together(product_id: int, limit: int = Query(6, ge=1, le=20), db: Session = Depends(database.get_db)):
+    """Products most often ordered together with this one."""
+    if db.query(Product.id).filter(Product.id == product_id).first() is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    reviews = db.query(Review).filter(Review.product_id == product.id).all()
-    avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
-    
-    discount = 0
-    if product.compare_at_price and product.compare_at_price > product.price:
-        discount = round((1 - product.price / product.compare_at_price) * 100)
-    
-    return {
-        "id": product.id,
-        "name": product.name,
-        "description": product.description,
-        "price": product.price,
-        "compare_at_price": product.compare_at_price,
-        "stock": product.stock,
-        "brand": product.brand,
-        "sku": product.sku,
-        "weight": product.weight,
-        "dimensions": product.dimensions,
-        "image_url": product.image_url,
-        "images": product.images,
-        "specifications": product.specifications,
-        "tags": product.tags,
-        "is_featured": product.is_featured,
-        "is_active": product.is_active,
-        "category_id": product.category_id,
-        "merchant_id": product.merchant_id,
-        "average_rating": round(avg_rating, 1),
-        "review_count": len(reviews),
-        "discount_percent": discount,
-        "created_at": product.created_at,
-        "updated_at": product.updated_at,
-        "category": {"id": product.category.id, "name": product.category.name, "description": product.category.description} if product.category else None
+    # Read a few extra partners in case some are no longer for sale
+    partners = bought_together(product_id, limit * 2)
+    if not partners:
+        return []
+    products = {
+        p.id: p for p in db.query(Product).filter(
+            Product.id.in_([partner_id for partner_id, _ in partners]),
+            Product.is_active == True,
+        )
     }
+    
+    result = []
+    for partner_id, orders in partners:
+        p = products.get(partner_id)
+        if p is None:
+            continue
+        result.append({
+            "id": p.id,
+            "name": p.name,
+            "price": p.price,
+            "compare_at_price": p.compare_at_price,
+            "image_url": p.image_url,
+            "brand": p.brand,
+            "average_rating": round(p.average_rating, 1),
+            "review_count": p.review_count,
+            "orders_together": orders
+        })
+    return result[:limit]
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
 def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(database.get_db)):
@@ -231,4 +494,5 @@ def update_product(product_id: int, product_update: ProductUpdate, db: Session =
     
     db.commit()
     db.refresh(product)
+    cache.invalidate_product(product.id)
     return product
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.review import Review
 from app.models.order import Order
+from app.models.product import Product
 from app.core.dependencies import get_current_user
+from app.core import cache
+from app.core.pagination import paginate
 from app.schemas.review import ReviewCreate, ReviewUpdate, ReviewResponse, ReviewStats
+from app.services.ratings import apply_rating_change
 
 router = APIRouter(
     prefix="/reviews",
@@ -16,14 +20,20 @@ router = APIRouter(
 @router.get("/product/{product_id}", response_model=List[ReviewResponse])
 def get_product_reviews(
     product_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Get all reviews for a product."""
-    reviews = db.query(Review).filter(
+    query = db.query(Review).options(joinedload(Review.user)).filter(
         Review.product_id == product_id
-    ).order_by(Review.created_at.desc()).offset(skip).limit(limit).all()
+    )
+    reviews = paginate(
+        query, [(Review.created_at, True), (Review.id, True)],
+        key="newest", response=response, cursor=cursor, skip=skip, limit=limit
+    )
     
     # Add user names to response
     result = []
@@ -48,26 +58,19 @@ def get_product_reviews(
 @router.get("/product/{product_id}/stats", response_model=ReviewStats)
 def get_product_review_stats(product_id: int, db: Session = Depends(get_db)):
     """Get review statistics for a product."""
-    reviews = db.query(Review).filter(Review.product_id == product_id).all()
+    product = db.query(Product).filter(Product.id == product_id).first()
     
-    if not reviews:
+    if not product or not product.review_count:
         return ReviewStats(
             average_rating=0,
             total_reviews=0,
             rating_distribution={5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
         )
     
-    total = len(reviews)
-    avg = sum(r.rating for r in reviews) / total
-    
-    distribution = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
-    for r in reviews:
-        distribution[r.rating] += 1
-    
     return ReviewStats(
-        average_rating=round(avg, 1),
-        total_reviews=total,
-        rating_distribution=distribution
+        average_rating=round(product.average_rating, 1),
+        total_reviews=product.review_count,
+        rating_distribution=product.rating_distribution
     )
 
 @router.post("/", response_model=ReviewResponse)
@@ -104,8 +107,10 @@ def create_review(
         verified_purchase=verified
     )
     db.add(new_review)
+    apply_rating_change(db, review.product_id, added=review.rating)
     db.commit()
     db.refresh(new_review)
+    cache.invalidate_product(review.product_id)
     
     return {
         **new_review.__dict__,
@@ -128,11 +133,17 @@ def update_review(
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    old_rating = review.rating
     for key, value in review_update.dict(exclude_unset=True).items():
         setattr(review, key, value)
     
+    if review.rating != old_rating:
+        apply_rating_change(db, review.product_id, added=review.rating, removed=old_rating)
+    
     db.commit()
     db.refresh(review)
+    if review.rating != old_rating:
+        cache.invalidate_product(review.product_id)
     
     return {
         **review.__dict__,
@@ -154,8 +165,10 @@ def delete_review(
     if review.user_id != current_user.id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    apply_rating_change(db, review.product_id, removed=review.rating)
     db.delete(review)
     db.commit()
+    cache.invalidate_product(review.product_id)
     
     return {"message": "Review deleted"}
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List
 from app.database import get_db
 from app.models.user import User
@@ -19,33 +19,9 @@ def get_wishlist(
     current_user: User = Depends(get_current_user)
 ):
     """Get user's wishlist with product details."""
-    items = db.query(WishlistItem).filter(
+    return db.query(WishlistItem).options(joinedload(WishlistItem.product)).filter(
         WishlistItem.user_id == current_user.id
     ).all()
-    
-    result = []
-    for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        result.append({
-            "id": item.id,
-            "user_id": item.user_id,
-            "product_id": item.product_id,
-            "created_at": item.created_at,
-            "product": {
-                "id": product.id,
-                "name": product.name,
-                "price": product.price,
-                "compare_at_price": product.compare_at_price,
-                "image_url": product.image_url,
-                "brand": product.brand,
-                "stock": product.stock,
-                "average_rating": product.average_rating,
-                "review_count": product.review_count,
-                "discount_percent": product.discount_percent
-            } if product else None
-        })
-    
-    return result
 
 @router.post("/{product_id}")
 def add_to_wishlist(
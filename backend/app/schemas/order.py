@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class OrderItemSchema(BaseModel):
@@ -25,6 +25,27 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AdminOrderSummary(BaseModel):
+    id: int
+    user_id: Optional[int] = None
+    total_amount: float
+    status: str
+    created_at: Optional[datetime] = None
+    user_email: str
+    items_count: int
+
+class MerchantOrderItem(BaseModel):
+    product_name: str
+    quantity: int
+    price: float
+
+class MerchantOrder(BaseModel):
+    id: int
+    status: str
+    created_at: Optional[datetime] = None
+    customer_email: Optional[str] = None
+    items: List[MerchantOrderItem]
+
 # Cart Schemas
 class CartItem(BaseModel):
     product_id: int
@@ -32,3 +53,14 @@ class CartItem(BaseModel):
 
 class Cart(BaseModel):
     items: List[CartItem]
+
+# Most operations accepted by one PATCH /cart/items
+MAX_CART_OPERATIONS = 100
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    quantity: int = 0
+
+class CartOperations(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=MAX_CART_OPERATIONS)
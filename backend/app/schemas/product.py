@@ -1,12 +1,16 @@
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Annotated, List, Optional, Dict, Any
+from pydantic import AfterValidator, BaseModel
 from datetime import datetime
 
+# Average ratings are served rounded to one decimal
+AverageRating = Annotated[float, AfterValidator(lambda value: round(value, 1))]
+
 # Category Schemas
 class CategoryBase(BaseModel):
     name: str
     description: Optional[str] = None
     image_url: Optional[str] = None
+    parent_id: Optional[int] = None
 
 class CategoryCreate(CategoryBase):
     pass
@@ -17,6 +21,19 @@ class Category(CategoryBase):
     class Config:
         from_attributes = True
 
+class CategorySummary(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
+class CategoryWithCount(Category):
+    # Over the category and all its subcategories
+    product_count: int = 0  # active products
+    total_count: int = 0
+    in_stock_count: int = 0
+
 # Product Schemas
 class ProductBase(BaseModel):
     name: str
@@ -60,7 +77,7 @@ class ProductUpdate(BaseModel):
 class ProductResponse(ProductBase):
     id: int
     merchant_id: Optional[int] = None
-    average_rating: float = 0
+    average_rating: AverageRating = 0
     review_count: int = 0
     discount_percent: int = 0
     created_at: datetime
@@ -70,6 +87,121 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductSummary(BaseModel):
+    """Product card: the fields shown in grids, carousels and recommendations."""
+    id: int
+    name: str
+    price: float
+    compare_at_price: Optional[float] = None
+    image_url: Optional[str] = None
+    brand: Optional[str] = None
+    average_rating: AverageRating = 0
+    review_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class SimilarProduct(ProductSummary):
+    similarity: float
+
+class BoughtTogetherProduct(ProductSummary):
+    orders_together: int
+
+class ProductListItem(BaseModel):
+    """
+    One product of the listing. Every field is optional because the listing returns only
+    the fields asked for (fields= / view=); it is served with exclude_unset.
+    """
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    compare_at_price: Optional[float] = None
+    stock: Optional[int] = None
+    brand: Optional[str] = None
+    sku: Optional[str] = None
+    image_url: Optional[str] = None
+    images: Optional[List[str]] = None
+    specifications: Optional[Dict[str, Any]] = None
+    tags: Optional[List[str]] = None
+    is_featured: Optional[bool] = None
+    is_active: Optional[bool] = None
+    category_id: Optional[int] = None
+    merchant_id: Optional[int] = None
+    average_rating: Optional[float] = None
+    review_count: Optional[int] = None
+    discount_percent: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    category: Optional[CategorySummary] = None
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    missing: List[int]
+
+class AdminProductSummary(BaseModel):
+    id: int
+    name: str
+    price: float
+    stock: Optional[int] = None
+    brand: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_featured: Optional[bool] = None
+    category_name: str
+    merchant_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class MerchantProductSummary(BaseModel):
+    id: int
+    name: str
+    price: float
+    stock: Optional[int] = None
+    image_url: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_featured: Optional[bool] = None
+    category_name: Optional[str] = None
+    average_rating: AverageRating = 0
+    review_count: int = 0
+    created_at: Optional[datetime] = None
+
+class ProductSuggestion(BaseModel):
+    type: str  # product, brand or category
+    text: str
+    id: Optional[int] = None  # absent for brands
+
+# Facet counts for the listing sidebar
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class CategoryFacet(BaseModel):
+    id: int
+    name: Optional[str] = None
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    min: int
+    max: Optional[int] = None  # open-ended last bucket
+    count: int
+
+class AvailabilityFacet(BaseModel):
+    in_stock: int
+    out_of_stock: int
+
+class SpecificationFacet(BaseModel):
+    key: str
+    param: str
+    values: List[FacetValue]
+
+class ProductFacets(BaseModel):
+    total: int
+    brands: List[FacetValue]
+    categories: List[CategoryFacet]
+    price_ranges: List[PriceRangeFacet]
+    availability: AvailabilityFacet
+    specifications: List[SpecificationFacet]
+    tags: List[FacetValue]
+
 # For backwards compatibility
 Product = ProductResponse
 
@@ -83,4 +215,9 @@ class ProductFilter(BaseModel):
     in_stock: Optional[bool] = None
     is_featured: Optional[bool] = None
     search: Optional[str] = None
+    specs: Optional[Dict[str, List[str]]] = None  # spec.<key>=value; values of one key are alternatives
+    tags: Optional[List[str]] = None  # all must match
     sort_by: Optional[str] = None  # price_asc, price_desc, rating, newest
+
+class ProductBatchRequest(BaseModel):
+    ids: List[int]
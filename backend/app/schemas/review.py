@@ -30,6 +30,16 @@ class ReviewResponse(ReviewBase):
     class Config:
         from_attributes = True
 
+class AdminReviewSummary(BaseModel):
+    id: int
+    product_id: int
+    product_name: str
+    user_email: str
+    rating: int
+    title: Optional[str] = None
+    comment: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class ReviewStats(BaseModel):
     average_rating: float
     total_reviews: int
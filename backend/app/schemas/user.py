@@ -1,5 +1,6 @@
 from typing import Optional
 from pydantic import BaseModel, EmailStr
+from datetime import datetime
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -33,6 +34,15 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class AdminUserSummary(BaseModel):
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = None
+    role: UserRole
+    store_name: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class UserRoleUpdate(BaseModel):
     role: UserRole
 
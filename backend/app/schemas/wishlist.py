@@ -1,17 +1,30 @@
 from typing import Optional
 from pydantic import BaseModel
 from datetime import datetime
-from app.schemas.product import ProductResponse
+from app.schemas.product import ProductSummary
 
 class WishlistItemCreate(BaseModel):
     product_id: int
 
+class WishlistProduct(ProductSummary):
+    stock: Optional[int] = None
+    discount_percent: int = 0
+    created_at: Optional[datetime] = None
+
 class WishlistItemResponse(BaseModel):
     id: int
     user_id: int
     product_id: int
     created_at: datetime
-    product: Optional[ProductResponse] = None
+    product: Optional[WishlistProduct] = None
 
     class Config:
         from_attributes = True
+
+class AdminWishlistItem(BaseModel):
+    id: int
+    user_id: int
+    user_email: str
+    product_id: int
+    product_name: str
+    created_at: Optional[datetime] = None
@@ -0,0 +1,91 @@
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from app.models.product import Product, ProductAttribute
+
+MAX_VALUE_LENGTH = 200
+
+def normalize(value) -> str:
+    return str(value).strip().lower()[:MAX_VALUE_LENGTH]
+
+def extract_attributes(product_id: int, specifications: Optional[dict], tags: Optional[list]) -> List[dict]:
+    """Attribute rows for one product: each scalar specification value (or list item) and each tag."""
+    rows, seen = [], set()
+
+    def add(kind, key_label, value_label):
+        key, value = normalize(key_label) if key_label else "", normalize(value_label)
+        if value and (kind, key, value) not in seen:
+            seen.add((kind, key, value))
+            rows.append({
+                "product_id": product_id, "kind": kind, "key": key, "value": value,
+                "key_label": key_label, "value_label": str(value_label).strip()[:MAX_VALUE_LENGTH],
+            })
+
+    if isinstance(specifications, dict):
+        for key, value in specifications.items():
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, (str, int, float, bool)):
+                    add("spec", str(key).strip(), item)
+    if isinstance(tags, list):
+        for tag in tags:
+            if isinstance(tag, (str, int, float)):
+                add("tag", None, tag)
+    return rows
+
+def sync_attributes(conn: Connection, product_ids: Iterable[int]):
+    """Rewrite the attribute rows of the given products from their current JSON columns."""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return
+    conn.execute(delete(ProductAttribute).where(ProductAttribute.product_id.in_(product_ids)))
+    rows = []
+    for product_id, specifications, tags in conn.execute(
+        select(Product.id, Product.specifications, Product.tags).where(Product.id.in_(product_ids))
+    ):
+        rows.extend(extract_attributes(product_id, specifications, tags))
+    if rows:
+        conn.execute(insert(ProductAttribute), rows)
+
+def ensure_attribute_index(engine: Engine, batch_size: int = 1000):
+    """Backfill the attribute table when it is empty but products exist (first run after upgrade)."""
+    with engine.begin() as conn:
+        if conn.execute(select(ProductAttribute.id).limit(1)).first() is not None:
+            return
+        last_id, total = 0, 0
+        while True:
+            ids = conn.execute(
+                select(Product.id).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            sync_attributes(conn, ids)
+            last_id, total = ids[-1], total + len(ids)
+    if total:
+        print(f"✅ Attribute index built for {total} products")
+
+def attribute_product_ids(kind: str, key: str, values: List[str]):
+    """Subquery of product ids having any of `values` for this attribute."""
+    return select(ProductAttribute.product_id).where(
+        ProductAttribute.kind == kind,
+        ProductAttribute.key == (normalize(key) if key else ""),
+        ProductAttribute.value.in_([normalize(v) for v in values]),
+    )
+
+def _sync_flushed_products(session, flush_context):
+    # Same transaction as the product write, so the index never disagrees with committed data
+    changed = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Product):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            attrs = inspect(obj).attrs
+            if attrs.specifications.history.has_changes() or attrs.tags.history.has_changes():
+                changed.add(obj.id)
+    changed.discard(None)
+    if changed:
+        sync_attributes(session.connection(), changed)
+
+def install_attribute_hooks(session_factory):
+    """Keep product_attributes in step with ORM writes to products made through `session_factory`."""
+    event.listen(session_factory, "after_flush", _sync_flushed_products)
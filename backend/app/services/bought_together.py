@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import Counter
+from itertools import combinations
+from typing import Iterable, List, Tuple
+import redis
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from app.core.redis import redis_client
+from app.models.order import OrderItem
+
+# Each product's row of the co-occurrence matrix is a sorted set: partner id -> orders shared
+# Rows have their own prefix so a rebuild's SCAN never matches the lock or built marker
+PAIRS_KEY = "cooc:pairs:{}"
+BUILT_KEY = "cooc:built:pairs"
+LOCK_KEY = "cooc:lock"
+
+# Partners kept per product; the weakest are dropped beyond this, which bounds Redis memory
+MAX_PARTNERS = 100
+# Baskets larger than this add no pairs (they are rare and quadratic in size)
+MAX_BASKET = 50
+# Pair counts held in process memory before they are flushed to Redis during a build
+FLUSH_PAIRS = 200_000
+
+def _pairs(product_ids: Iterable[int]) -> List[Tuple[int, int]]:
+    basket = sorted(set(product_ids))
+    if len(basket) > MAX_BASKET:
+        return []
+    return list(combinations(basket, 2))
+
+def _trim(pipe, keys: Iterable[str]):
+    for key in keys:
+        pipe.zremrangebyrank(key, 0, -(MAX_PARTNERS + 1))
+
+def _flush(counts: Counter, trim: bool = True):
+    """Add pair counts to both products' rows, then (with `trim`) trim the rows that grew."""
+    touched = set()
+    pipe = redis_client.pipeline(transaction=False)
+    for (a, b), count in counts.items():
+        pipe.zincrby(PAIRS_KEY.format(a), count, b)
+        pipe.zincrby(PAIRS_KEY.format(b), count, a)
+        touched.update((a, b))
+    if trim:
+        _trim(pipe, (PAIRS_KEY.format(product_id) for product_id in touched))
+    pipe.execute()
+
+def record_order(product_ids: Iterable[int]):
+    """Count one new order's basket; called after checkout commits."""
+    pairs = _pairs(product_ids)
+    if not pairs:
+        return
+    try:
+        _flush(Counter(pairs))
+    except redis.RedisError:
+        pass
+
+def build(engine: Engine, batch_size: int = 10_000):
+    """
+    Rebuild the matrix from order history in one streaming pass over order_items, ordered
+    by order_id so each basket is complete when the next order starts. Memory is bounded by
+    one basket plus FLUSH_PAIRS pending counts, whatever the size of the history. Rows are
+    trimmed to MAX_PARTNERS only after the last flush, so the counts kept are exact.
+    Orders placed while this runs have ids above the cut-off and are counted by record_order.
+    """
+    started = time.time()
+    for key in redis_client.scan_iter(match=PAIRS_KEY.format("*"), count=1000):
+        redis_client.delete(key)
+
+    with engine.connect() as conn:
+        last_order_id = conn.execute(select(func.max(OrderItem.order_id))).scalar() or 0
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(OrderItem.order_id, OrderItem.product_id)
+            .where(OrderItem.order_id <= last_order_id)
+            .order_by(OrderItem.order_id)
+        )
+        counts: Counter = Counter()
+        current_order, basket, lines = None, [], 0
+        for order_id, product_id in result:
+            lines += 1
+            if order_id != current_order:
+                counts.update(_pairs(basket))
+                current_order, basket = order_id, []
+                if len(counts) >= FLUSH_PAIRS:
+                    _flush(counts, trim=False)
+                    counts.clear()
+            basket.append(product_id)
+        counts.update(_pairs(basket))
+        _flush(counts, trim=False)
+
+    pipe = redis_client.pipeline(transaction=False)
+    _trim(pipe, redis_client.scan_iter(match=PAIRS_KEY.format("*"), count=1000))
+    pipe.execute()
+
+    redis_client.set(BUILT_KEY, last_order_id)
+    print(f"✅ Bought-together index built from {lines} order lines in {time.time() - started:.1f}s")
+
+def bought_together(product_id: int, limit: int) -> List[Tuple[int, int]]:
+    """(partner id, orders shared) for the products most often bought with `product_id`."""
+    try:
+        pairs = redis_client.zrevrange(PAIRS_KEY.format(product_id), 0, limit - 1, withscores=True)
+    except redis.RedisError:
+        return []
+    return [(int(partner), int(count)) for partner, count in pairs]
+
+def _build_if_missing(engine: Engine):
+    try:
+        if redis_client.exists(BUILT_KEY) or not redis_client.set(LOCK_KEY, 1, nx=True, ex=3600):
+            return
+        try:
+            build(engine)
+        finally:
+            redis_client.delete(LOCK_KEY)
+    except Exception as e:
+        print(f"⚠️ Bought-together build failed: {e}")
+
+def start_build(engine: Engine):
+    """Backfill from order history in the background, unless another process already has."""
+    threading.Thread(target=_build_if_missing, args=(engine,), name="bought-together", daemon=True).start()
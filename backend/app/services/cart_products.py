@@ -0,0 +1,82 @@
+from typing import Dict, Iterable
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.redis import redis_client
+from app.models.product import Product
+
+# Redis hash per product with the fields a cart needs, read through from the database
+CART_PRODUCT_KEY = "cart_product:{}"
+CART_PRODUCT_FIELDS = (Product.id, Product.name, Product.price, Product.image_url, Product.stock, Product.is_active)
+
+def _decode(product_id: int, fields: dict) -> dict:
+    return {
+        "id": product_id,
+        "name": fields["name"],
+        "price": float(fields["price"]),
+        "image_url": fields["image_url"] or None,
+        "stock": int(fields["stock"]),
+        "is_active": fields["is_active"] == "1",
+    }
+
+def _encode(row) -> dict:
+    return {
+        "name": row.name,
+        "price": repr(float(row.price)),
+        "image_url": row.image_url or "",
+        "stock": row.stock or 0,
+        "is_active": int(bool(row.is_active)),
+    }
+
+def get_cart_products(db: Session, product_ids: Iterable[int], ttl: int) -> Dict[int, dict]:
+    """
+    Name, price, image, stock and active flag of each product, by id. Cached products cost one
+    pipelined Redis round-trip for the whole cart; the rest are loaded with one IN query and
+    cached for `ttl` seconds. Products that no longer exist are left out.
+    """
+    ids = list(dict.fromkeys(product_ids))
+    if not ids:
+        return {}
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for product_id in ids:
+            pipe.hgetall(CART_PRODUCT_KEY.format(product_id))
+        cached = pipe.execute()
+    except redis.RedisError:
+        cached = [{}] * len(ids)
+
+    products = {product_id: _decode(product_id, fields) for product_id, fields in zip(ids, cached) if fields}
+    missing = [product_id for product_id in ids if product_id not in products]
+    if missing:
+        rows = db.execute(select(*CART_PRODUCT_FIELDS).where(Product.id.in_(missing))).all()
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for row in rows:
+                key = CART_PRODUCT_KEY.format(row.id)
+                pipe.hset(key, mapping=_encode(row))
+                pipe.expire(key, ttl)
+            pipe.execute()
+        except redis.RedisError:
+            pass
+        for row in rows:
+            products[row.id] = _decode(row.id, {k: str(v) for k, v in _encode(row).items()})
+    return products
+
+def invalidate_cart_products(product_ids: Iterable[int], category_ids: Iterable[int] = ()):
+    """Catalog commit listener: drop the cached cart fields of written products."""
+    keys = [CART_PRODUCT_KEY.format(product_id) for product_id in product_ids]
+    if not keys:
+        return
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError:
+        pass
+
+def clear_cart_products():
+    """Drop every cached product (the catalog was reset, so ids may be reused)."""
+    try:
+        keys = list(redis_client.scan_iter(match=CART_PRODUCT_KEY.format("*"), count=1000))
+        if keys:
+            redis_client.delete(*keys)
+    except redis.RedisError:
+        pass
@@ -0,0 +1,197 @@
+from typing import Dict, List, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.redis import async_redis_client, redis_client
+from app.database import SessionLocal
+from app.services.cart_products import CART_PRODUCT_KEY, get_cart_products
+
+PRODUCT_PREFIX = CART_PRODUCT_KEY.format("")
+
+# Every script ends by returning the cart as {product id, quantity, name, price, image_url} rows,
+# read from the cart_product hashes in the same call. Those keys aren't known
+# before the script runs, so they aren't declared in KEYS (fine outside Redis Cluster).
+# Prices are passed back as the stored strings: Redis would truncate Lua numbers to integers.
+_SUMMARY = """
+local function summary(cart, prefix)
+    local flat = redis.call('HGETALL', cart)
+    local lines = {}
+    for i = 1, #flat, 2 do
+        local p = redis.call('HMGET', prefix .. flat[i], 'name', 'price', 'image_url')
+        lines[#lines + 1] = {flat[i], flat[i + 1], p[1], p[2], p[3]}
+    end
+    return lines
+end
+"""
+
+# KEYS: cart. ARGV: product key prefix, cart TTL in seconds (0 for none). Reading a cart keeps it alive.
+_READ = _SUMMARY + """
+if tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return summary(KEYS[1], ARGV[1])
+"""
+
+# KEYS: cart. ARGV: product key prefix, cart TTL in seconds (0 for none), final flag, then
+# mode (add | set | remove), product id and quantity for each change, applied in order.
+# Products not in the cache make the script return {'missing', ids} without changing anything,
+# so they can be loaded and the script re-run; with the final flag set they are reported instead.
+# Otherwise returns {'done', {status, applied quantity} per change, summary}; status is ok,
+# clamped, missing or inactive, and refused changes leave the cart line as it was.
+_UPDATE = _SUMMARY + """
+local cart, prefix, final = KEYS[1], ARGV[1], ARGV[3] == '1'
+local products, missing = {}, {}
+for i = 4, #ARGV, 3 do
+    local pid = ARGV[i + 1]
+    if ARGV[i] ~= 'remove' and products[pid] == nil then
+        local product = redis.call('HMGET', prefix .. pid, 'stock', 'is_active')
+        if product[1] then
+            products[pid] = product
+        else
+            products[pid] = false
+            missing[#missing + 1] = pid
+        end
+    end
+end
+if #missing > 0 and not final then
+    return {'missing', missing}
+end
+
+local results = {}
+for i = 4, #ARGV, 3 do
+    local mode, pid = ARGV[i], ARGV[i + 1]
+    local status, applied = 'ok', 0
+    if mode == 'remove' then
+        redis.call('HDEL', cart, pid)
+    elseif not products[pid] then
+        status = 'missing'
+    elseif products[pid][2] ~= '1' then
+        status = 'inactive'
+    else
+        local wanted = tonumber(ARGV[i + 2])
+        if mode == 'add' then
+            wanted = wanted + tonumber(redis.call('HGET', cart, pid) or '0')
+        end
+        applied = math.max(0, math.min(wanted, tonumber(products[pid][1])))
+        if applied < wanted then
+            status = 'clamped'
+        end
+        if applied > 0 then
+            redis.call('HSET', cart, pid, applied)
+        else
+            redis.call('HDEL', cart, pid)
+        end
+    end
+    results[#results + 1] = {status, applied}
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('EXPIRE', cart, ARGV[2])
+end
+return {'done', results, summary(cart, prefix)}
+"""
+
+# KEYS: anonymous cart, user cart. ARGV: product key prefix, user cart TTL. Adds each anonymous line to the
+# user's cart (capped at cached stock, when the product is cached) and deletes the anonymous cart.
+_MERGE = """
+local guest, cart, prefix = KEYS[1], KEYS[2], ARGV[1]
+local flat = redis.call('HGETALL', guest)
+for i = 1, #flat, 2 do
+    local pid = flat[i]
+    local quantity = tonumber(flat[i + 1]) + tonumber(redis.call('HGET', cart, pid) or '0')
+    local stock = redis.call('HGET', prefix .. pid, 'stock')
+    if stock then
+        quantity = math.min(quantity, tonumber(stock))
+    end
+    if quantity > 0 then
+        redis.call('HSET', cart, pid, quantity)
+    end
+end
+redis.call('DEL', guest)
+if tonumber(ARGV[2]) > 0 and redis.call('EXISTS', cart) == 1 then
+    redis.call('EXPIRE', cart, ARGV[2])
+end
+return #flat / 2
+"""
+
+# Request handlers run the cart scripts on the async client; login merges on the sync one
+_read_script = async_redis_client.register_script(_READ)
+_update_script = async_redis_client.register_script(_UPDATE)
+_merge_script = redis_client.register_script(_MERGE)
+
+class CartError(Exception):
+    """A cart change was refused: `status` is missing (no such product) or inactive."""
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+def _load_products(product_ids: List[int], ttl: int) -> Dict[int, dict]:
+    with SessionLocal() as db:
+        return get_cart_products(db, product_ids, ttl)
+
+async def _priced(lines: list, ttl: int) -> dict:
+    """The cart response from script rows; rows whose product wasn't cached are loaded in one go."""
+    cold = [int(line[0]) for line in lines if line[2] is None]
+    # Only uncached products need the (synchronous) database, off the event loop
+    loaded = await run_in_threadpool(_load_products, cold, ttl) if cold else {}
+
+    items = []
+    total_amount = 0.0
+    for pid_str, qty_str, name, price, image_url in lines:
+        pid = int(pid_str)
+        qty = int(qty_str)
+        if name is None:
+            product = loaded.get(pid)
+            if product is None:
+                continue
+            name, price, image_url = product["name"], product["price"], product["image_url"]
+        price = float(price)
+        total_amount += price * qty
+        items.append({
+            "product_id": pid,
+            "name": name,
+            "price": price,
+            "image_url": image_url or None,
+            "quantity": qty,
+        })
+    return {"items": items, "total_amount": total_amount}
+
+async def read_cart(cart_key: str, ttl: int, cart_ttl: int = 0) -> dict:
+    """
+    The priced cart in one Redis call (plus one IN query if some products aren't cached).
+    With `cart_ttl`, the read pushes the cart's expiry back to that many seconds.
+    """
+    return await _priced(await _read_script(keys=[cart_key], args=[PRODUCT_PREFIX, cart_ttl]), ttl)
+
+async def apply_cart_changes(
+    cart_key: str, changes: List[Tuple[str, int, int]], ttl: int, cart_ttl: int = 0
+) -> Tuple[List[dict], dict]:
+    """
+    Apply (mode, product id, quantity) changes to a cart, in order and atomically, in one
+    Redis call; mode is add, set or remove. Quantities are capped at each product's cached
+    stock; products that don't exist or aren't active are skipped. Products not cached yet
+    are loaded with one IN query and the script re-run. Returns ({status, quantity} per
+    change, priced cart). With `cart_ttl`, the cart expires that many seconds after its last change.
+    """
+    args = [PRODUCT_PREFIX, cart_ttl, 0]
+    for mode, product_id, quantity in changes:
+        args += [mode, product_id, quantity]
+    result = await _update_script(keys=[cart_key], args=args)
+    if result[0] == "missing":
+        await run_in_threadpool(_load_products, [int(product_id) for product_id in result[1]], ttl)
+        args[2] = 1
+        result = await _update_script(keys=[cart_key], args=args)
+
+    _, statuses, lines = result
+    return [{"status": status, "quantity": int(applied)} for status, applied in statuses], await _priced(lines, ttl)
+
+async def change_cart(cart_key: str, mode: str, product_id: int, quantity: int, ttl: int, cart_ttl: int = 0) -> dict:
+    """
+    Add to, set or remove one cart line (see apply_cart_changes) and return the priced cart with
+    the quantity actually applied. Raises CartError for unknown or inactive products.
+    """
+    (result,), cart = await apply_cart_changes(cart_key, [(mode, product_id, quantity)], ttl, cart_ttl)
+    if result["status"] in ("missing", "inactive"):
+        raise CartError(result["status"])
+    return {"quantity": result["quantity"], "clamped": result["status"] == "clamped", **cart}
+
+def merge_carts(guest_key: str, cart_key: str, cart_ttl: int = 0) -> int:
+    """Move an anonymous cart into a user's cart in one atomic step. Returns the lines merged."""
+    return int(_merge_script(keys=[guest_key, cart_key], args=[PRODUCT_PREFIX, cart_ttl]))
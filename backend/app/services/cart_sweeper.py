@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from typing import Dict, Iterator, List
+import redis
+from prometheus_client import Counter
+from sqlalchemy import select
+from app.core.redis import redis_client
+from app.database import SessionLocal
+from app.models.product import Product
+
+CART_PATTERN = "cart:*"
+GUEST_CART_PREFIX = "cart:guest:"
+
+# Abandoned-cart events for downstream consumers (reminder emails, analytics), newest last
+ABANDONED_STREAM = "events:abandoned_carts"
+ABANDONED_STREAM_MAXLEN = 10_000
+# Set while a cart's abandonment has been reported; expires with the cart
+NOTIFIED_KEY = "cart_abandoned:{}"
+SWEEP_LOCK_KEY = "cart_sweep:lock"
+LAST_SWEEP_KEY = "cart_sweep:last"
+
+# Rough per-key overhead when the server can't report MEMORY USAGE (fakeredis)
+ESTIMATED_KEY_OVERHEAD = 72
+
+ABANDONED_CARTS = Counter("abandoned_carts_total", "Carts reported as abandoned", ["kind"])
+
+def cart_ttl(key: str, user_ttl: int, guest_ttl: int) -> int:
+    """The sliding expiry of a cart key."""
+    return guest_ttl if key.startswith(GUEST_CART_PREFIX) else user_ttl
+
+def _cart_batches(batch_size: int) -> Iterator[List[str]]:
+    batch = []
+    for key in redis_client.scan_iter(match=CART_PATTERN, count=batch_size):
+        batch.append(key)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _inactive_products(product_ids: List[str]) -> set:
+    """Ids (as in the cart hashes) of products that are deactivated or no longer exist, in one IN query."""
+    ids = [int(pid) for pid in product_ids if pid.isdigit()]
+    if not ids:
+        return set()
+    with SessionLocal() as db:
+        active = db.execute(select(Product.id).where(Product.id.in_(ids), Product.is_active == True)).scalars()
+        return set(product_ids) - {str(product_id) for product_id in active}
+
+def _compact(pipe, key: str, lines: Dict[str, str], inactive: set) -> Dict[str, str]:
+    """Drop lines with a broken quantity or a product that is no longer sold."""
+    dead = [pid for pid, qty in lines.items() if not qty.isdigit() or int(qty) <= 0 or pid in inactive]
+    if dead:
+        pipe.hdel(key, *dead)
+    return {pid: qty for pid, qty in lines.items() if pid not in dead}
+
+def sweep_carts(user_ttl: int, guest_ttl: int, abandoned_after: int, batch_size: int = 500) -> dict:
+    """
+    One SCAN pass over the cart keys:
+    - carts from before expiry existed get their TTL, so every cart eventually expires;
+    - lines for products that are inactive or deleted (per the database) are removed;
+    - carts idle for `abandoned_after` seconds are reported once on ABANDONED_STREAM.
+    Idle time is read off the sliding TTL (full TTL minus what is left), so no timestamps are stored.
+    """
+    stats = {"scanned": 0, "expiry_set": 0, "compacted": 0, "abandoned": 0}
+    for keys in _cart_batches(batch_size):
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+            pipe.hgetall(key)
+        replies = pipe.execute()
+        carts = {key: (ttl, lines) for key, ttl, lines in zip(keys, replies[::2], replies[1::2]) if lines}
+        stats["scanned"] += len(carts)
+
+        # The cached cart_product hashes are dropped on every product write, deactivation
+        # included, so only the database says reliably which products are gone
+        inactive = _inactive_products(sorted({pid for _, lines in carts.values() for pid in lines}))
+
+        pipe = redis_client.pipeline(transaction=False)
+        events = []
+        for key, (ttl, lines) in carts.items():
+            full = cart_ttl(key, user_ttl, guest_ttl)
+            compacted = _compact(pipe, key, lines, inactive)
+            if len(compacted) != len(lines):
+                stats["compacted"] += 1
+            if ttl == -1:
+                pipe.expire(key, full)
+                stats["expiry_set"] += 1
+                continue
+            idle = full - ttl
+            if compacted and idle >= abandoned_after and ttl > 0:
+                events.append((key, ttl, idle, compacted))
+        pipe.execute()
+
+        for key, ttl, idle, lines in events:
+            if not redis_client.set(NOTIFIED_KEY.format(key), 1, nx=True, ex=ttl):
+                continue
+            kind = "guest" if key.startswith(GUEST_CART_PREFIX) else "user"
+            owner = key[len(GUEST_CART_PREFIX):] if kind == "guest" else key[len("cart:"):]
+            redis_client.xadd(ABANDONED_STREAM, {
+                "cart": key,
+                "kind": kind,
+                "owner": owner,
+                "lines": len(lines),
+                "quantity": sum(int(qty) for qty in lines.values()),
+                "idle_seconds": idle,
+                "expires_in": ttl,
+                "items": json.dumps({pid: int(qty) for pid, qty in lines.items()}),
+            }, maxlen=ABANDONED_STREAM_MAXLEN, approximate=True)
+            ABANDONED_CARTS.labels(kind).inc()
+            stats["abandoned"] += 1
+    return stats
+
+def cart_memory_report(batch_size: int = 500) -> dict:
+    """Size of the cart keyspace, from a SCAN pass with MEMORY USAGE per key (estimated without it)."""
+    report = {
+        "carts": 0, "user_carts": 0, "guest_carts": 0, "lines": 0,
+        "without_expiry": 0, "bytes": 0, "estimated": False,
+    }
+    for keys in _cart_batches(batch_size):
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+            pipe.hlen(key)
+        replies = pipe.execute()
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.memory_usage(key)
+            sizes = pipe.execute()
+        except redis.ResponseError:
+            sizes = None
+            report["estimated"] = True
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(key)
+            contents = pipe.execute()
+
+        for i, key in enumerate(keys):
+            ttl, lines = replies[2 * i], replies[2 * i + 1]
+            if not lines:
+                continue
+            report["carts"] += 1
+            report["guest_carts" if key.startswith(GUEST_CART_PREFIX) else "user_carts"] += 1
+            report["lines"] += lines
+            if ttl == -1:
+                report["without_expiry"] += 1
+            if sizes is not None:
+                report["bytes"] += sizes[i] or 0
+            else:
+                report["bytes"] += ESTIMATED_KEY_OVERHEAD + len(key) + sum(
+                    len(pid) + len(qty) for pid, qty in contents[i].items()
+                )
+    report["bytes_per_cart"] = report["bytes"] // report["carts"] if report["carts"] else 0
+    try:
+        last = redis_client.get(LAST_SWEEP_KEY)
+    except redis.RedisError:
+        last = None
+    report["last_sweep"] = json.loads(last) if last else None
+    return report
+
+def _run_sweeper(interval: int, user_ttl: int, guest_ttl: int, abandoned_after: int):
+    while True:
+        try:
+            # One process sweeps at a time
+            if redis_client.set(SWEEP_LOCK_KEY, 1, nx=True, ex=max(interval * 2, 600)):
+                try:
+                    started = time.time()
+                    stats = sweep_carts(user_ttl, guest_ttl, abandoned_after)
+                    stats.update(finished_at=int(time.time()), seconds=round(time.time() - started, 2))
+                    redis_client.set(LAST_SWEEP_KEY, json.dumps(stats))
+                finally:
+                    redis_client.delete(SWEEP_LOCK_KEY)
+        except Exception as e:
+            print(f"⚠️ Cart sweep failed: {e}")
+        time.sleep(interval)
+
+def start_cart_sweeper(interval: int, user_ttl: int, guest_ttl: int, abandoned_after: int):
+    """Sweep the cart keyspace every `interval` seconds in a background thread."""
+    threading.Thread(
+        target=_run_sweeper, args=(interval, user_ttl, guest_ttl, abandoned_after), name="cart-sweeper", daemon=True
+    ).start()
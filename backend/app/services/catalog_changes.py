@@ -0,0 +1,48 @@
+from typing import Callable, List, Set
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.product import Product, Category
+
+# Called after each commit that wrote products or categories: listener(product_ids, category_ids)
+CatalogListener = Callable[[Set[int], Set[int]], None]
+
+_listeners: List[CatalogListener] = []
+
+def on_catalog_commit(listener: CatalogListener):
+    """Register an in-memory index to be told which products and categories were written."""
+    _listeners.append(listener)
+
+def mark_products_changed(db: Session, *product_ids: int):
+    """Queue products changed outside the ORM unit of work (bulk UPDATEs) for listeners on commit."""
+    db.info.setdefault("catalog_products", set()).update(product_ids)
+
+def _collect_flushed(session, flush_context):
+    products = session.info.setdefault("catalog_products", set())
+    categories = session.info.setdefault("catalog_categories", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product) and obj.id is not None:
+            products.add(obj.id)
+        elif isinstance(obj, Category) and obj.id is not None:
+            categories.add(obj.id)
+
+def _notify(session):
+    products = session.info.pop("catalog_products", None) or set()
+    categories = session.info.pop("catalog_categories", None) or set()
+    if not (products or categories):
+        return
+    for listener in _listeners:
+        try:
+            listener(products, categories)
+        except Exception as e:
+            # The write is already committed; a stale index must not fail the request
+            print(f"⚠️ Catalog listener {getattr(listener, '__qualname__', listener)} failed: {e}")
+
+def _discard(session, previous_transaction):
+    session.info.pop("catalog_products", None)
+    session.info.pop("catalog_categories", None)
+
+def install_change_hooks(session_factory):
+    """Notify listeners about products and categories written through `session_factory` sessions."""
+    event.listen(session_factory, "after_flush", _collect_flushed)
+    event.listen(session_factory, "after_commit", _notify)
+    event.listen(session_factory, "after_soft_rollback", _discard)
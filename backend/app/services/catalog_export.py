@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.engine import Engine
+from app.core.pagination import bind_value
+from app.models.product import Product
+
+# Rows fetched from the server-side cursor at a time, and rows per chunk written to the response
+EXPORT_BATCH_SIZE = 1000
+
+# Columns in export order. Names match the import format, so an export can be re-imported.
+EXPORT_COLUMNS = [
+    Product.id, Product.sku, Product.name, Product.description, Product.price, Product.compare_at_price,
+    Product.stock, Product.brand, Product.weight, Product.dimensions, Product.image_url, Product.images,
+    Product.specifications, Product.tags, Product.is_featured, Product.is_active, Product.category_id,
+    Product.merchant_id, Product.rating_avg, Product.rating_count, Product.created_at, Product.updated_at,
+]
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+# CSV cells holding lists or objects are written as JSON, which the importer reads back
+JSON_FIELDS = ("dimensions", "images", "specifications", "tags")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Database time the export started, to the second; pass it as the next updated_since to pick up later changes
+WATERMARK_HEADER = "X-Export-Watermark"
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _record(row) -> dict:
+    record = dict(zip(FIELDS, row))
+    for field in ("created_at", "updated_at"):
+        if record[field] is not None:
+            record[field] = _utc(record[field]).isoformat()
+    return record
+
+def export_query(
+    dialect: str,
+    updated_since: Optional[datetime] = None,
+    merchant_id: Optional[int] = None,
+    include_inactive: bool = False,
+):
+    """
+    Products to export, in id order. With `updated_since`, only rows created or changed since
+    then (to the second, inclusive), deactivated ones included so feeds can drop them.
+    """
+    query = select(*EXPORT_COLUMNS).order_by(Product.id)
+    if merchant_id is not None:
+        query = query.where(Product.merchant_id == merchant_id)
+    if updated_since is not None:
+        # Whole seconds: SQLite's timestamps have no fraction, and a row changed in the same
+        # second as the previous watermark is exported again rather than skipped
+        since = bind_value(_utc(updated_since).replace(microsecond=0), dialect)
+        # updated_at is only set by UPDATEs, so untouched rows are matched on created_at
+        query = query.where(or_(
+            Product.updated_at >= since,
+            and_(Product.updated_at.is_(None), Product.created_at >= since),
+        ))
+    elif not include_inactive:
+        query = query.where(Product.is_active == True)
+    return query
+
+def _rows(engine: Engine, query) -> Iterator[list]:
+    """Rows in lists of EXPORT_BATCH_SIZE, read through a server-side cursor where the driver has one."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(query)
+        for partition in result.partitions():
+            yield partition
+
+def iter_ndjson(engine: Engine, query) -> Iterator[bytes]:
+    for rows in _rows(engine, query):
+        yield "".join(json.dumps(_record(row), default=str) + "\n" for row in rows).encode("utf-8")
+
+def iter_csv(engine: Engine, query) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for rows in _rows(engine, query):
+        for row in rows:
+            record = _record(row)
+            for field in JSON_FIELDS:
+                if record[field] is not None:
+                    record[field] = json.dumps(record[field])
+            writer.writerow(record)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def stream_export(engine: Engine, fmt: str, query) -> Iterator[bytes]:
+    """
+    Encoded export chunks, one per batch of rows. Runs on its own connection because the
+    response body is sent after the request's session has been closed.
+    """
+    return iter_csv(engine, query) if fmt == "csv" else iter_ndjson(engine, query)
+
+def _watermark(engine: Engine) -> str:
+    """Now on the database clock, which also sets updated_at, in whole seconds."""
+    with engine.connect() as conn:
+        now = conn.execute(select(func.now())).scalar()
+    return _utc(now).replace(microsecond=0).isoformat()
+
+def export_response(engine: Engine, fmt: str, query, filename: str) -> StreamingResponse:
+    watermark = _watermark(engine)
+    return StreamingResponse(
+        stream_export(engine, fmt, query),
+        media_type=MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+            WATERMARK_HEADER: watermark,
+        },
+    )
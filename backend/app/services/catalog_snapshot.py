@@ -0,0 +1,262 @@
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.models.product import CategoryClosure, Product
+from app.schemas.product import ProductFilter
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed when the snapshot is enabled
+    np = None
+
+# Same sort keys and cursor layout as PRODUCT_SORTS in app.routers.product, so cursors
+# work on either path. "name" and search relevance stay on the database.
+SNAPSHOT_SORTS = {
+    "price_asc": [("price", False), ("id", False)],
+    "price_desc": [("price", True), ("id", True)],
+    "newest": [("created_at", True), ("id", True)],
+    "rating": [("rating_avg", True), ("rating_count", True), ("id", True)],
+}
+
+COLUMNS = {
+    "id": "int64",
+    "price": "float64",
+    "stock": "int64",
+    "category_id": "int64",
+    "brand_code": "int32",
+    "is_featured": "bool",
+    "is_active": "bool",
+    "rating_avg": "float64",
+    "rating_count": "int64",
+    "created_at": "int64",  # microseconds since the epoch, UTC
+}
+
+SOURCE_COLUMNS = [
+    Product.id, Product.price, Product.stock, Product.category_id, Product.brand,
+    Product.is_featured, Product.is_active, Product.rating_avg, Product.rating_count, Product.created_at,
+]
+
+def _to_micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return 0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000)
+
+def _from_micros(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+
+class CatalogSnapshot:
+    """
+    Columnar in-memory copy of the product fields the listing filters and sorts on.
+    Filters become vectorized masks over the columns, sort orders are argsorts cached until
+    the next write, and only the ids of the requested page go back to the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._engine: Optional[Engine] = None
+        self._size = 0
+        self._cols: Dict[str, "np.ndarray"] = {}
+        self._rows: Dict[int, int] = {}  # product id -> row
+        self._brands: List[str] = []
+        self._brand_codes: Dict[str, int] = {}
+        self._orders: Dict[str, "np.ndarray"] = {}
+        self._subtrees: Dict[int, "np.ndarray"] = {}  # category id -> ids of it and its descendants
+
+    @property
+    def ready(self) -> bool:
+        return self._engine is not None
+
+    def can_serve(self, filters: ProductFilter, sort_key: str) -> bool:
+        return (
+            self.ready and sort_key in SNAPSHOT_SORTS
+            and not (filters.search or filters.specs or filters.tags)
+        )
+
+    # --- Building and maintenance ---
+
+    def build(self, engine: Engine, batch_size: int = 10_000):
+        """Load the whole catalog. Streams rows so only the columns are ever held in memory."""
+        if np is None:
+            print("⚠️ Catalog snapshot disabled: numpy is not installed")
+            return
+        with self._lock:
+            self._size = 0
+            self._rows, self._brands, self._brand_codes, self._orders = {}, [], {}, {}
+            self._cols = {name: np.empty(1024, dtype=dtype) for name, dtype in COLUMNS.items()}
+            with engine.connect() as conn:
+                result = conn.execution_options(yield_per=batch_size).execute(select(*SOURCE_COLUMNS))
+                for row in result:
+                    self._upsert(row)
+                self._load_subtrees(conn)
+            self._engine = engine
+        print(f"✅ Catalog snapshot built: {self._size} products, {self.memory_usage()['total_bytes']} bytes")
+
+    def refresh(self, product_ids: Iterable[int], category_ids: Iterable[int] = ()):
+        """
+        Re-read the given products after a write; ids that no longer exist are dropped from results.
+        Any category write reloads the category tree, which is small next to the catalog.
+        """
+        ids = list(set(product_ids))
+        if not self.ready:
+            return
+        if category_ids:
+            with self._engine.connect() as conn, self._lock:
+                self._load_subtrees(conn)
+        if not ids:
+            return
+        with self._engine.connect() as conn:
+            rows = conn.execute(select(*SOURCE_COLUMNS).where(Product.id.in_(ids))).all()
+        with self._lock:
+            for row in rows:
+                self._upsert(row)
+            for missing in set(ids) - {row.id for row in rows}:
+                if missing in self._rows:
+                    self._cols["is_active"][self._rows[missing]] = False
+            self._orders = {}
+
+    def _load_subtrees(self, conn):
+        subtrees: Dict[int, List[int]] = {}
+        for ancestor_id, descendant_id in conn.execute(
+            select(CategoryClosure.ancestor_id, CategoryClosure.descendant_id)
+        ):
+            subtrees.setdefault(ancestor_id, []).append(descendant_id)
+        self._subtrees = {ancestor_id: np.array(ids, dtype="int64") for ancestor_id, ids in subtrees.items()}
+
+    def _brand_code(self, brand: Optional[str]) -> int:
+        if not brand:
+            return -1
+        if brand not in self._brand_codes:
+            self._brand_codes[brand] = len(self._brands)
+            self._brands.append(brand)
+        return self._brand_codes[brand]
+
+    def _upsert(self, row):
+        index = self._rows.get(row.id)
+        if index is None:
+            if self._size == len(self._cols["id"]):
+                # Amortized doubling, like a list
+                for name, column in self._cols.items():
+                    grown = np.empty(len(column) * 2, dtype=column.dtype)
+                    grown[:self._size] = column[:self._size]
+                    self._cols[name] = grown
+            index = self._size
+            self._size += 1
+            self._rows[row.id] = index
+        cols = self._cols
+        cols["id"][index] = row.id
+        cols["price"][index] = row.price
+        cols["stock"][index] = row.stock or 0
+        cols["category_id"][index] = row.category_id if row.category_id is not None else -1
+        cols["brand_code"][index] = self._brand_code(row.brand)
+        cols["is_featured"][index] = bool(row.is_featured)
+        cols["is_active"][index] = bool(row.is_active)
+        cols["rating_avg"][index] = row.rating_avg or 0
+        cols["rating_count"][index] = row.rating_count or 0
+        cols["created_at"][index] = _to_micros(row.created_at)
+        self._orders = {}
+
+    # --- Queries ---
+
+    def _column(self, name: str):
+        return self._cols[name][:self._size]
+
+    def _sorted_rows(self, sort_key: str):
+        order = self._orders.get(sort_key)
+        if order is None:
+            # np.lexsort treats the last key as primary; negate keys sorted descending
+            keys = [
+                -self._column(name) if desc else self._column(name)
+                for name, desc in reversed(SNAPSHOT_SORTS[sort_key])
+            ]
+            order = np.lexsort(keys)
+            self._orders[sort_key] = order
+        return order
+
+    def _mask(self, filters: ProductFilter):
+        mask = self._column("is_active").copy()
+        if filters.category_id:
+            subtree = self._subtrees.get(filters.category_id, [filters.category_id])
+            mask &= np.isin(self._column("category_id"), subtree)
+        if filters.brand:
+            term = filters.brand.lower()
+            codes = [code for code, name in enumerate(self._brands) if term in name.lower()]
+            mask &= np.isin(self._column("brand_code"), codes)
+        if filters.min_price is not None:
+            mask &= self._column("price") >= filters.min_price
+        if filters.max_price is not None:
+            mask &= self._column("price") <= filters.max_price
+        if filters.in_stock:
+            mask &= self._column("stock") > 0
+        if filters.is_featured:
+            mask &= self._column("is_featured")
+        if filters.min_rating is not None:
+            mask &= self._column("rating_avg") >= filters.min_rating
+        return mask
+
+    def _after(self, sort_key: str, values: list):
+        """Rows that sort strictly after the cursor row (same semantics as the keyset WHERE)."""
+        after = np.zeros(self._size, dtype=bool)
+        ties = np.ones(self._size, dtype=bool)
+        for (name, desc), value in zip(SNAPSHOT_SORTS[sort_key], values):
+            if name == "created_at":
+                value = _to_micros(value)
+            column = self._column(name)
+            after |= ties & (column < value if desc else column > value)
+            ties &= column == value
+        return after
+
+    def page(
+        self,
+        filters: ProductFilter,
+        sort_key: str,
+        *,
+        response: Response,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[int]:
+        """Product ids for one page of the listing, in order. Sets X-Next-Cursor like paginate()."""
+        with self._lock:
+            mask = self._mask(filters)
+            if cursor:
+                values = decode_cursor(cursor, sort_key)
+                mask &= self._after(sort_key, values)
+                skip = 0
+            order = self._sorted_rows(sort_key)
+            rows = order[mask[order]][skip:skip + limit]
+
+            if len(rows) and len(rows) == limit:
+                last = rows[-1]
+                values = [
+                    _from_micros(int(self._cols[name][last])) if name == "created_at" else self._cols[name][last].item()
+                    for name, _ in SNAPSHOT_SORTS[sort_key]
+                ]
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort_key, values)
+            return self._cols["id"][rows].tolist()
+
+    def memory_usage(self) -> dict:
+        """Bytes held by the snapshot: allocated column capacity plus the id, brand and category tree lookups."""
+        with self._lock:
+            columns = {name: int(column.nbytes) for name, column in self._cols.items()}
+            lookups = sys.getsizeof(self._rows) + sys.getsizeof(self._brand_codes) + sum(
+                sys.getsizeof(brand) for brand in self._brands
+            ) + sys.getsizeof(self._subtrees) + sum(int(ids.nbytes) for ids in self._subtrees.values())
+            orders = sum(int(order.nbytes) for order in self._orders.values())
+            return {
+                "products": self._size,
+                "capacity": len(self._cols["id"]) if self._cols else 0,
+                "brands": len(self._brands),
+                "columns": columns,
+                "sort_orders_bytes": orders,
+                "lookup_bytes": lookups,
+                "total_bytes": sum(columns.values()) + orders + lookups,
+            }
+
+catalog_snapshot = CatalogSnapshot()
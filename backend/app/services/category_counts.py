@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Iterable, List, Optional
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from app.models.product import Category, CategoryClosure, Product
+
+def count_categories(db: Session) -> List[dict]:
+    """
+    Every category with product counts over its whole subtree, in one grouped query:
+    `total_count` includes inactive products, `in_stock_count` is active products with
+    stock. `product_count` (active products) is maintained on the row by app.services.category_tree.
+    """
+    in_stock = case((Product.is_active & (Product.stock > 0), 1), else_=0)
+    rows = db.execute(
+        select(
+            Category.id, Category.name, Category.description, Category.image_url, Category.parent_id,
+            Category.product_count, func.count(Product.id), func.coalesce(func.sum(in_stock), 0),
+        )
+        .outerjoin(CategoryClosure, CategoryClosure.ancestor_id == Category.id)
+        .outerjoin(Product, Product.category_id == CategoryClosure.descendant_id)
+        .group_by(Category.id)
+        .order_by(Category.id)
+    ).all()
+    return [
+        {
+            "id": category_id,
+            "name": name,
+            "description": description,
+            "image_url": image_url,
+            "parent_id": parent_id,
+            "product_count": active,
+            "total_count": total,
+            "in_stock_count": stocked,
+        }
+        for category_id, name, description, image_url, parent_id, active, total, stocked in rows
+    ]
+
+class CategoryCountCache:
+    """
+    Process-local copy of the counted category listing. It is dropped on every catalog commit
+    (products created, moved, deactivated or restocked; categories written) in this process;
+    the TTL bounds how long other processes' writes can go unseen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Optional[List[dict]] = None
+        self._expires = 0.0
+        self._generation = 0
+
+    def get(self, db: Session, ttl: int) -> List[dict]:
+        with self._lock:
+            if self._rows is not None and time.monotonic() < self._expires:
+                return self._rows
+            generation = self._generation
+        rows = count_categories(db)
+        with self._lock:
+            # Don't keep a result that an invalidation raced with
+            if generation == self._generation:
+                self._rows, self._expires = rows, time.monotonic() + ttl
+        return rows
+
+    def invalidate(self, product_ids: Iterable[int] = (), category_ids: Iterable[int] = ()):
+        with self._lock:
+            self._generation += 1
+            self._rows = None
+
+category_counts = CategoryCountCache()
@@ -0,0 +1,172 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, update
+from sqlalchemy.engine import Connection, Engine
+from app.models.product import Category, CategoryClosure, Product
+
+def subtree_ids(category_id: int):
+    """Subquery of the ids of a category and all its descendants."""
+    return select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+def _ancestor_ids(category_id: int):
+    return select(CategoryClosure.ancestor_id).where(CategoryClosure.descendant_id == category_id)
+
+def add_to_counts(conn: Connection, deltas: Dict[int, int]):
+    """
+    Add `delta` to the product_count of each category and all its ancestors. Counts are not
+    part of any cached category representation, so the ETag version is left alone.
+    """
+    for category_id, delta in deltas.items():
+        if category_id is not None and delta:
+            conn.execute(
+                update(Category)
+                .where(Category.id.in_(_ancestor_ids(category_id)))
+                .values(product_count=Category.product_count + delta, version=Category.version)
+            )
+
+def add_category(conn: Connection, category_id: int, parent_id: Optional[int]):
+    """Closure rows for a new category: itself, plus its parent's ancestors one level further down."""
+    conn.execute(insert(CategoryClosure).values(ancestor_id=category_id, descendant_id=category_id, depth=0))
+    if parent_id is not None:
+        conn.execute(insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(CategoryClosure.ancestor_id, literal(category_id), CategoryClosure.depth + 1)
+            .where(CategoryClosure.descendant_id == parent_id),
+        ))
+
+def move_category(conn: Connection, category_id: int, parent_id: Optional[int]):
+    """
+    Re-parent a category with its whole subtree: paths from outside ancestors into the subtree
+    are replaced, paths within it are kept, and the subtree's count moves to the new ancestors.
+    """
+    subtree = conn.execute(
+        select(CategoryClosure.descendant_id, CategoryClosure.depth).where(CategoryClosure.ancestor_id == category_id)
+    ).all()
+    subtree_set = {descendant for descendant, _ in subtree}
+    if parent_id in subtree_set:
+        raise ValueError(f"Category {parent_id} is inside the subtree of category {category_id}")
+    count = conn.execute(select(Category.product_count).where(Category.id == category_id)).scalar() or 0
+
+    old_ancestors = [a for (a,) in conn.execute(_ancestor_ids(category_id)) if a not in subtree_set]
+    if old_ancestors and count:
+        conn.execute(
+            update(Category).where(Category.id.in_(old_ancestors))
+            .values(product_count=Category.product_count - count, version=Category.version)
+        )
+    conn.execute(delete(CategoryClosure).where(
+        CategoryClosure.descendant_id.in_(subtree_set),
+        CategoryClosure.ancestor_id.notin_(subtree_set),
+    ))
+    if parent_id is None:
+        return
+    new_ancestors = conn.execute(
+        select(CategoryClosure.ancestor_id, CategoryClosure.depth).where(CategoryClosure.descendant_id == parent_id)
+    ).all()
+    conn.execute(insert(CategoryClosure), [
+        {"ancestor_id": ancestor, "descendant_id": descendant, "depth": up + down + 1}
+        for ancestor, up in new_ancestors
+        for descendant, down in subtree
+    ])
+    if count:
+        conn.execute(
+            update(Category).where(Category.id.in_([ancestor for ancestor, _ in new_ancestors]))
+            .values(product_count=Category.product_count + count, version=Category.version)
+        )
+
+def remove_category(conn: Connection, category_id: int):
+    """Drop a deleted (leaf) category from the closure and its products from its ancestors' counts."""
+    count = conn.execute(select(Category.product_count).where(Category.id == category_id)).scalar() or 0
+    add_to_counts(conn, {category_id: -count})
+    conn.execute(delete(CategoryClosure).where(
+        (CategoryClosure.ancestor_id == category_id) | (CategoryClosure.descendant_id == category_id)
+    ))
+
+def rebuild_category_tree(conn: Connection):
+    """Recompute the whole closure from parent_id, and every product_count with one grouped query."""
+    parents = dict(conn.execute(select(Category.id, Category.parent_id)).all())
+    rows = []
+    for category_id in parents:
+        ancestor, depth, seen = category_id, 0, set()
+        while ancestor is not None and ancestor not in seen:
+            seen.add(ancestor)
+            rows.append({"ancestor_id": ancestor, "descendant_id": category_id, "depth": depth})
+            ancestor, depth = parents.get(ancestor), depth + 1
+    conn.execute(delete(CategoryClosure))
+    if rows:
+        conn.execute(insert(CategoryClosure), rows)
+
+    counts = dict(conn.execute(
+        select(CategoryClosure.ancestor_id, func.count(Product.id))
+        .join(Product, Product.category_id == CategoryClosure.descendant_id)
+        .where(Product.is_active == True)
+        .group_by(CategoryClosure.ancestor_id)
+    ).all())
+    for category_id in parents:
+        conn.execute(
+            update(Category).where(Category.id == category_id)
+            .values(product_count=counts.get(category_id, 0), version=Category.version)
+        )
+
+def ensure_category_tree(engine: Engine):
+    """Build the closure on the first run after upgrade, or whenever it has fallen out of step."""
+    with engine.begin() as conn:
+        categories = conn.execute(select(func.count(Category.id))).scalar()
+        closed = conn.execute(
+            select(func.count()).select_from(CategoryClosure).where(CategoryClosure.depth == 0)
+        ).scalar()
+        if categories != closed:
+            rebuild_category_tree(conn)
+            print(f"✅ Category tree built for {categories} categories")
+
+def product_count_deltas(changes: Iterable[tuple]) -> Counter:
+    """
+    Count deltas from (old category, old active, new category, new active) tuples:
+    a product counts towards its category while it is active.
+    """
+    deltas = Counter()
+    for old_category, old_active, new_category, new_active in changes:
+        if old_category is not None and old_active:
+            deltas[old_category] -= 1
+        if new_category is not None and new_active:
+            deltas[new_category] += 1
+    return deltas
+
+def _old_value(state, name: str):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[name].value
+
+def _maintain_flushed(session, flush_context):
+    # Same transaction as the write: categories first, so products added to a new category count
+    conn = session.connection()
+    for obj in session.new:
+        if isinstance(obj, Category):
+            add_category(conn, obj.id, obj.parent_id)
+    for obj in session.dirty:
+        if isinstance(obj, Category) and inspect(obj).attrs.parent_id.history.has_changes():
+            move_category(conn, obj.id, obj.parent_id)
+
+    changes: List[tuple] = []
+    for obj in session.new:
+        if isinstance(obj, Product):
+            changes.append((None, False, obj.category_id, obj.is_active))
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if state.attrs.category_id.history.has_changes() or state.attrs.is_active.history.has_changes():
+                changes.append((
+                    _old_value(state, "category_id"), _old_value(state, "is_active"), obj.category_id, obj.is_active,
+                ))
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes.append((obj.category_id, obj.is_active, None, False))
+    add_to_counts(conn, product_count_deltas(changes))
+
+    for obj in session.deleted:
+        if isinstance(obj, Category):
+            remove_category(conn, obj.id)
+
+def install_category_hooks(session_factory):
+    """Keep category_closure and product counts in step with ORM writes made through `session_factory`."""
+    event.listen(session_factory, "after_flush", _maintain_flushed)
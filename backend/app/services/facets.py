@@ -0,0 +1,89 @@
+from collections import defaultdict
+from sqlalchemy import case, func, select
+from app.models.product import Product, Category, ProductAttribute
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = [25, 50, 100, 250, 500, 1000]
+
+# Most specification keys, and values per key or tags, listed in the facets
+MAX_ATTRIBUTE_KEYS = 20
+MAX_ATTRIBUTE_VALUES = 20
+
+def _price_bucket():
+    return case(
+        *[(Product.price < bound, index) for index, bound in enumerate(PRICE_BUCKETS)],
+        else_=len(PRICE_BUCKETS),
+    )
+
+def count_facets(query) -> dict:
+    """
+    Compute all facet counts for a filtered Product query in one grouped query.
+    Rows are grouped by every facet dimension at once and rolled up per facet here,
+    so the result set is bounded by the number of distinct combinations, not products.
+    """
+    bucket = _price_bucket()
+    in_stock = case((Product.stock > 0, 1), else_=0)
+    rows = query.outerjoin(Category, Category.id == Product.category_id).with_entities(
+        Product.brand, Product.category_id, Category.name, bucket, in_stock, func.count(Product.id)
+    ).group_by(Product.brand, Product.category_id, Category.name, bucket, in_stock).all()
+
+    total = 0
+    brands, categories = {}, {}
+    prices = [0] * (len(PRICE_BUCKETS) + 1)
+    availability = {"in_stock": 0, "out_of_stock": 0}
+    for brand, category_id, category_name, bucket_index, stocked, count in rows:
+        total += count
+        if brand:
+            brands[brand] = brands.get(brand, 0) + count
+        if category_id is not None:
+            entry = categories.setdefault(category_id, {"id": category_id, "name": category_name, "count": 0})
+            entry["count"] += count
+        prices[bucket_index] += count
+        availability["in_stock" if stocked else "out_of_stock"] += count
+
+    bounds = [0] + PRICE_BUCKETS + [None]
+    specifications, tags = _attribute_facets(query)
+    return {
+        "total": total,
+        "brands": [
+            {"value": brand, "count": count}
+            for brand, count in sorted(brands.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "categories": sorted(categories.values(), key=lambda c: (-c["count"], c["name"] or "")),
+        "price_ranges": [
+            {"min": bounds[i], "max": bounds[i + 1], "count": count}
+            for i, count in enumerate(prices) if count
+        ],
+        "availability": availability,
+        "specifications": specifications,
+        "tags": tags,
+    }
+
+def _attribute_facets(query):
+    """Specification and tag value counts over the matching products, from the attribute index."""
+    matching = query.with_entities(Product.id).subquery()
+    rows = query.session.query(
+        ProductAttribute.kind, ProductAttribute.key, ProductAttribute.value,
+        func.min(ProductAttribute.key_label), func.min(ProductAttribute.value_label), func.count(),
+    ).filter(ProductAttribute.product_id.in_(select(matching.c.id))).group_by(
+        ProductAttribute.kind, ProductAttribute.key, ProductAttribute.value
+    ).all()
+
+    specs, key_labels, tags = defaultdict(list), {}, []
+    for kind, key, value, key_label, value_label, count in rows:
+        entry = {"value": value_label, "count": count}
+        if kind == "tag":
+            tags.append(entry)
+        else:
+            key_labels.setdefault(key, key_label)
+            specs[key].append(entry)
+
+    by_count = lambda entry: (-entry["count"], entry["value"])
+    keys = sorted(specs, key=lambda key: (-sum(e["count"] for e in specs[key]), key))[:MAX_ATTRIBUTE_KEYS]
+    return (
+        [
+            {"key": key_labels[key], "param": f"spec.{key}", "values": sorted(specs[key], key=by_count)[:MAX_ATTRIBUTE_VALUES]}
+            for key in keys
+        ],
+        sorted(tags, key=by_count)[:MAX_ATTRIBUTE_VALUES],
+    )
@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import uuid
+from typing import IO, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core import cache
+from app.models.product import Product, Category
+from app.schemas.product import ProductCreate, ProductUpdate
+from app.services.attributes import sync_attributes
+from app.services.catalog_changes import mark_products_changed
+from app.services.category_tree import add_to_counts, product_count_deltas
+
+# Rows per transaction: one SKU lookup, one multi-row INSERT and one bulk UPDATE each
+IMPORT_BATCH_SIZE = 1000
+
+# Per-row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# CSV cells holding lists or objects: JSON, or "a|b|c" for the list columns
+LIST_COLUMNS = ("images", "tags")
+JSON_COLUMNS = ("specifications", "dimensions")
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+def _csv_row(row: dict) -> dict:
+    # Empty cells are treated as absent, so they don't overwrite existing values on update
+    data = {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+    for column in LIST_COLUMNS:
+        if column in data and not data[column].lstrip().startswith("["):
+            data[column] = [item.strip() for item in data[column].split("|") if item.strip()]
+    for column in LIST_COLUMNS + JSON_COLUMNS:
+        if isinstance(data.get(column), str):
+            data[column] = json.loads(data[column])
+    return data
+
+def iter_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Yield (line, row, parse_error) one record at a time from a binary file object."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            try:
+                yield reader.line_num, _csv_row(row), None
+            except ValueError as e:
+                yield reader.line_num, None, f"Invalid JSON cell: {e}"
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(row, dict):
+                yield line_number, row, None
+            else:
+                yield line_number, None, "Each line must be a JSON object"
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[dict] = []
+
+    def error(self, line: int, message, sku: Optional[str] = None):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "sku": sku, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+def _write_batch(db: Session, merchant_id: int, batch: List[Tuple[int, ProductUpdate]], report: ImportReport):
+    # Later rows for the same SKU within a batch win, field by field
+    by_sku = {}
+    for line, product in batch:
+        sku = product.sku or f"SKU-{uuid.uuid4().hex[:8].upper()}"
+        entry = by_sku.setdefault(sku, {"lines": [], "fields": {}})
+        entry["lines"].append(line)
+        entry["fields"].update(product.dict(exclude_unset=True, exclude={"sku"}))
+
+    existing = {
+        sku: (product_id, owner, category_id, is_active)
+        for product_id, sku, owner, category_id, is_active in db.query(
+            Product.id, Product.sku, Product.merchant_id, Product.category_id, Product.is_active
+        ).filter(Product.sku.in_(list(by_sku)))
+    }
+
+    inserts, updates, moves = [], [], []
+    for sku, entry in by_sku.items():
+        if sku in existing:
+            product_id, owner, category_id, is_active = existing[sku]
+            if owner != merchant_id:
+                for line in entry["lines"]:
+                    report.error(line, "SKU belongs to another merchant", sku)
+                continue
+            updates.append((entry, {"id": product_id, **entry["fields"]}))
+            fields = entry["fields"]
+            moves.append((
+                category_id, is_active, fields.get("category_id", category_id), fields.get("is_active", is_active),
+            ))
+        else:
+            # New products must be complete; full rows (defaults included) give every insert
+            # the same columns, so the batch goes out as one multi-row statement
+            try:
+                row = ProductCreate(**entry["fields"], sku=sku).dict()
+            except ValidationError as e:
+                for line in entry["lines"]:
+                    report.error(line, e.errors(include_url=False, include_input=False), sku)
+                continue
+            inserts.append((entry, {**row, "merchant_id": merchant_id}))
+            moves.append((None, False, row.get("category_id"), row.get("is_active", True)))
+
+    try:
+        changed = [values["id"] for _, values in updates]
+        if inserts:
+            changed += db.scalars(insert(Product).returning(Product.id), [values for _, values in inserts]).all()
+        if updates:
+            db.execute(update(Product), [values for _, values in updates])
+        # Bulk statements skip the ORM flush hooks, so index the attributes and count the products here
+        sync_attributes(db.connection(), changed)
+        add_to_counts(db.connection(), product_count_deltas(moves))
+        mark_products_changed(db, *changed)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        message = f"Batch failed: {e.__class__.__name__}: {getattr(e, 'orig', e)}"
+        for entry, values in inserts + updates:
+            for line in entry["lines"]:
+                report.error(line, message, values.get("sku"))
+        return
+
+    report.created += sum(len(entry["lines"]) for entry, _ in inserts)
+    report.updated += sum(len(entry["lines"]) for entry, _ in updates)
+    report.batches += 1
+    cache.invalidate(cache.CATALOG, *[cache.product_namespace(values["id"]) for _, values in updates])
+
+def import_products(db: Session, merchant_id: int, stream: IO[bytes], fmt: str) -> dict:
+    """
+    Upsert a merchant's products by SKU from a CSV or NDJSON file, read one row at a time.
+    Rows for new SKUs are validated against ProductCreate; rows for existing SKUs may be
+    partial and only change the fields they set. Rows are written in batches of
+    IMPORT_BATCH_SIZE, each in its own transaction, so a bad batch doesn't undo earlier ones.
+    """
+    report = ImportReport()
+    category_ids = {category_id for (category_id,) in db.query(Category.id)}
+    batch: List[Tuple[int, ProductUpdate]] = []
+
+    for line, row, parse_error in iter_rows(stream, fmt):
+        report.processed += 1
+        if parse_error:
+            report.error(line, parse_error)
+            continue
+        try:
+            product = ProductUpdate(**row)
+        except ValidationError as e:
+            report.error(line, e.errors(include_url=False, include_input=False), row.get("sku"))
+            continue
+        if product.category_id is not None and product.category_id not in category_ids:
+            report.error(line, f"Unknown category_id {product.category_id}", product.sku)
+            continue
+        batch.append((line, product))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _write_batch(db, merchant_id, batch, report)
+            print(f"📦 Import for merchant {merchant_id}: {report.processed} rows, {report.failed} failed")
+            batch = []
+
+    if batch:
+        _write_batch(db, merchant_id, batch, report)
+    return report.as_dict()
@@ -0,0 +1,76 @@
+from typing import Optional
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.models.review import Review
+from app.services.catalog_changes import mark_products_changed
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+def _bucket(stars: int):
+    return getattr(Product, f"rating_{stars}")
+
+def apply_rating_change(
+    db: Session,
+    product_id: int,
+    added: Optional[int] = None,
+    removed: Optional[int] = None,
+):
+    """
+    Adjust a product's rating summary for a review write.
+    Pass `added` for a new rating, `removed` for a deleted one, or both for an edit.
+    Runs as a single UPDATE in the caller's transaction; the caller commits.
+    """
+    count_delta = (1 if added else 0) - (1 if removed else 0)
+    sum_delta = (added or 0) - (removed or 0)
+
+    new_count = func.coalesce(Product.rating_count, 0) + count_delta
+    new_sum = func.coalesce(Product.rating_sum, 0) + sum_delta
+
+    values = {}
+    if count_delta:
+        values[Product.rating_count] = new_count
+    if sum_delta:
+        values[Product.rating_sum] = new_sum
+    if count_delta or sum_delta:
+        # SET expressions see the pre-update row, so this is the post-update average
+        values[Product.rating_avg] = case((new_count > 0, new_sum * 1.0 / new_count), else_=0)
+    if added != removed:
+        if added:
+            values[_bucket(added)] = func.coalesce(_bucket(added), 0) + 1
+        if removed:
+            values[_bucket(removed)] = func.coalesce(_bucket(removed), 0) - 1
+
+    if values:
+        db.query(Product).filter(Product.id == product_id).update(values, synchronize_session="fetch")
+        mark_products_changed(db, product_id)
+
+def remove_user_ratings(db: Session, user_id: int):
+    """Take all of a user's reviews out of the rating summaries (before the user is deleted)."""
+    for product_id, rating in db.query(Review.product_id, Review.rating).filter(Review.user_id == user_id):
+        apply_rating_change(db, product_id, removed=rating)
+
+def rebuild_rating_summaries(db: Session):
+    """Recompute every product's rating summary from the reviews table."""
+    rows = db.query(
+        Review.product_id,
+        func.count(Review.id),
+        func.sum(Review.rating),
+        *[func.sum(case((Review.rating == stars, 1), else_=0)) for stars in RATING_VALUES]
+    ).group_by(Review.product_id).all()
+
+    empty = {"rating_count": 0, "rating_sum": 0, "rating_avg": 0, **{f"rating_{stars}": 0 for stars in RATING_VALUES}}
+    db.execute(update(Product).values(**empty))
+
+    if rows:
+        db.execute(update(Product), [
+            {
+                "id": product_id,
+                "rating_count": count,
+                "rating_sum": total,
+                "rating_avg": total / count,
+                **{f"rating_{stars}": hist for stars, hist in zip(RATING_VALUES, histogram)},
+            }
+            for product_id, count, total, *histogram in rows
+        ])
+    return len(rows)
@@ -0,0 +1,109 @@
+import re
+from typing import Optional
+from sqlalchemy import Float, Integer, func, literal_column, text
+from sqlalchemy.engine import Engine
+from app.models.product import Product
+
+# Which full-text engine is live: "sqlite" (FTS5), "postgresql" (tsvector + GIN) or None (ILIKE fallback)
+_backend: Optional[str] = None
+
+SQLITE_FTS_DDL = [
+    # External-content table: the text lives in products, FTS5 only stores the index
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, brand, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+        INSERT INTO products_fts(rowid, name, brand, description)
+        VALUES (new.id, new.name, new.brand, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, description)
+        VALUES ('delete', old.id, old.name, old.brand, old.description);
+    END""",
+]
+
+POSTGRES_FTS_DDL = [
+    # Generated column, so Postgres keeps it current on every insert/update
+    """ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(brand, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+def ensure_search_index(engine: Engine):
+    """
+    Create the full-text index for products if it is missing.
+    The index is maintained by the database itself (triggers on SQLite, a generated
+    column on Postgres), so every write path stays in sync without extra calls.
+    """
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                existing = conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = 'products_fts_ai'"
+                )).first()
+                for ddl in SQLITE_FTS_DDL:
+                    conn.execute(text(ddl))
+                if existing is None:
+                    # First run (or products was recreated): index the current catalog
+                    conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+            elif dialect == "postgresql":
+                for ddl in POSTGRES_FTS_DDL:
+                    conn.execute(text(ddl))
+            else:
+                return None
+        _backend = dialect
+        print(f"✅ Full-text search index ready ({dialect})")
+    except Exception as e:
+        _backend = None
+        print(f"⚠️ Full-text search unavailable, falling back to ILIKE: {e}")
+    return _backend
+
+def _terms(search: str):
+    return re.findall(r"\w+", search.lower())
+
+def apply_search(query, search: str):
+    """
+    Restrict a Product query to matches for `search`.
+    Returns (query, rank) where `rank` is a lower-is-better relevance expression to sort
+    ascending on, or None when only the ILIKE fallback is available.
+    """
+    terms = _terms(search)
+
+    if _backend == "sqlite" and terms:
+        # Every term must match, each as a word prefix: "mac air" -> "mac"* "air"*
+        match = " ".join(f'"{t}"*' for t in terms)
+        hits = text(
+            "SELECT rowid AS product_id, bm25(products_fts, 10.0, 5.0, 1.0) AS rank "
+            "FROM products_fts WHERE products_fts MATCH :match"
+        ).bindparams(match=match).columns(product_id=Integer, rank=Float).subquery("search_hits")
+        query = query.join(hits, hits.c.product_id == Product.id)
+        # bm25() is already lower-is-better
+        return query, hits.c.rank
+
+    if _backend == "postgresql" and terms:
+        vector = literal_column("products.search_vector")
+        ts_query = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in terms))
+        query = query.filter(vector.op("@@")(ts_query))
+        return query, -func.ts_rank_cd(vector, ts_query, type_=Float)
+
+    search_fmt = f"%{search}%"
+    query = query.filter(
+        Product.name.ilike(search_fmt) |
+        Product.description.ilike(search_fmt) |
+        Product.brand.ilike(search_fmt)
+    )
+    return query, None
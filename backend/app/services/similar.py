@@ -0,0 +1,215 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+import redis
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from app.core.redis import redis_client
+from app.models.product import Product
+
+try:
+    import numpy as np
+except ImportError:  # without numpy the job doesn't run and /similar returns nothing
+    np = None
+
+# Neighbours served per product; a few extra are stored so incremental updates can drop some
+TOP_K = 12
+STORED_K = 24
+# Cap on the attribute vocabulary of one category, keeping the most common attributes
+MAX_FEATURES = 2048
+# Rows of the similarity matrix computed at once (BATCH_ROWS x category size)
+BATCH_ROWS = 512
+
+SIMILAR_KEY = "similar:{}"
+DIRTY_KEY = "similar:dirty"
+BUILT_KEY = "similar:built"
+LOCK_KEY = "similar:lock"
+
+def _features(product) -> List[str]:
+    """Attribute tokens of a product: its tags, scalar specification values and brand."""
+    tokens = set()
+    for tag in product.tags or []:
+        if isinstance(tag, str) and tag.strip():
+            tokens.add(f"tag:{tag.strip().lower()}")
+    for key, value in (product.specifications or {}).items():
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if isinstance(item, (str, int, float, bool)) and str(item).strip():
+                tokens.add(f"spec:{str(key).strip().lower()}={str(item).strip().lower()}")
+    if product.brand:
+        tokens.add(f"brand:{product.brand.strip().lower()}")
+    return list(tokens)
+
+def _vectorize(features: List[List[str]]):
+    """TF-IDF style unit vectors (one row per product) over the attributes shared by 2+ products."""
+    n = len(features)
+    df: Dict[str, int] = defaultdict(int)
+    for tokens in features:
+        for token in tokens:
+            df[token] += 1
+    # An attribute on a single product can't make two products similar
+    shared = sorted((t for t, count in df.items() if count > 1), key=lambda t: (-df[t], t))[:MAX_FEATURES]
+    columns = {token: i for i, token in enumerate(shared)}
+    matrix = np.zeros((n, len(columns)), dtype=np.float32)
+    for row, tokens in enumerate(features):
+        for token in tokens:
+            column = columns.get(token)
+            if column is not None:
+                matrix[row, column] = math.log((n + 1) / df[token]) + 1
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def _top_neighbours(scores, ids) -> List[list]:
+    """Best STORED_K [id, score] pairs for each row of a similarity matrix, zero scores dropped."""
+    k = min(STORED_K, scores.shape[1])
+    if k == 0:
+        return [[] for _ in range(len(scores))]
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best = ids[np.take_along_axis(best, order, axis=1)].tolist()
+    best_scores = np.take_along_axis(best_scores, order, axis=1).astype(np.float64).round(4).tolist()
+    return [
+        [[product_id, score] for product_id, score in zip(row_ids, row_scores) if score > 0]
+        for row_ids, row_scores in zip(best, best_scores)
+    ]
+
+class _Block:
+    """Active products of one category with their attribute vectors."""
+
+    def __init__(self, rows):
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.position = {int(product_id): i for i, product_id in enumerate(self.ids)}
+        self.matrix = _vectorize([_features(row) for row in rows])
+
+    def similarities(self, rows):
+        """Cosine similarity of the given block rows against the whole block, self-matches removed."""
+        scores = self.matrix[rows] @ self.matrix.T
+        scores[np.arange(len(rows)), rows] = -1
+        return scores
+
+def _load_block(conn, category_id: Optional[int]) -> _Block:
+    query = select(Product.id, Product.tags, Product.specifications, Product.brand).where(Product.is_active == True)
+    query = query.where(Product.category_id == category_id if category_id is not None else Product.category_id.is_(None))
+    return _Block(conn.execute(query.order_by(Product.id)).all())
+
+def _store(pipe, block: _Block, rows, scores):
+    for row, neighbours in zip(rows, _top_neighbours(scores, block.ids)):
+        pipe.set(SIMILAR_KEY.format(int(block.ids[row])), json.dumps(neighbours))
+
+def rebuild_all(engine: Engine):
+    """Recompute neighbours for every active product, one category at a time."""
+    if np is None:
+        return
+    started = time.time()
+    with engine.connect() as conn:
+        category_ids = [c for (c,) in conn.execute(select(Product.category_id).where(Product.is_active == True).distinct())]
+        total = 0
+        for category_id in category_ids:
+            block = _load_block(conn, category_id)
+            for start in range(0, len(block.ids), BATCH_ROWS):
+                rows = np.arange(start, min(start + BATCH_ROWS, len(block.ids)))
+                pipe = redis_client.pipeline(transaction=False)
+                _store(pipe, block, rows, block.similarities(rows))
+                pipe.execute()
+            total += len(block.ids)
+    redis_client.set(BUILT_KEY, int(time.time()))
+    print(f"✅ Similar products built for {total} products in {time.time() - started:.1f}s")
+
+def refresh_changed(engine: Engine, batch_size: int = 1000) -> int:
+    """
+    Recompute neighbours for up to `batch_size` products queued by mark_changed, and patch the
+    lists of other products in their categories: changed products are dropped from those lists
+    and re-ranked in. Only the affected categories are loaded. Returns how many were processed.
+    """
+    if np is None:
+        return 0
+    changed = [int(product_id) for product_id in redis_client.spop(DIRTY_KEY, batch_size) or []]
+    if not changed:
+        return 0
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(Product.id, Product.category_id, Product.is_active).where(Product.id.in_(changed))
+        ).all()
+        by_category = defaultdict(list)
+        for row in rows:
+            if row.is_active:
+                by_category[row.category_id].append(row.id)
+        gone = set(changed) - {product_id for ids in by_category.values() for product_id in ids}
+        if gone:
+            redis_client.delete(*[SIMILAR_KEY.format(product_id) for product_id in gone])
+
+        for category_id, product_ids in by_category.items():
+            block = _load_block(conn, category_id)
+            changed_rows = np.array([block.position[product_id] for product_id in product_ids])
+            scores = block.similarities(changed_rows)
+            changed_set = set(product_ids)
+
+            pipe = redis_client.pipeline(transaction=False)
+            _store(pipe, block, changed_rows, scores)
+            # Everyone else: re-rank the changed products into their stored lists
+            keys = [SIMILAR_KEY.format(int(product_id)) for product_id in block.ids]
+            for row, stored in enumerate(redis_client.mget(keys)):
+                product_id = int(block.ids[row])
+                if product_id in changed_set:
+                    continue
+                previous = json.loads(stored) if stored else []
+                current = [entry for entry in previous if entry[0] not in changed_set]
+                candidates = [[int(block.ids[c]), round(float(scores[i, row]), 4)] for i, c in enumerate(changed_rows)]
+                candidates = [entry for entry in candidates if entry[1] > 0]
+                if candidates or len(current) != len(previous):
+                    merged = sorted(current + candidates, key=lambda entry: -entry[1])[:STORED_K]
+                    pipe.set(keys[row], json.dumps(merged))
+            pipe.execute()
+    return len(changed)
+
+def mark_changed(product_ids: Iterable[int], category_ids: Iterable[int] = ()):
+    """Catalog commit listener: queue products for the next refresh."""
+    product_ids = list(product_ids)
+    if product_ids:
+        try:
+            redis_client.sadd(DIRTY_KEY, *product_ids)
+        except redis.RedisError:
+            pass
+
+def request_rebuild():
+    """Have the worker recompute everything on its next run (e.g. after the catalog was reset)."""
+    try:
+        redis_client.delete(BUILT_KEY, DIRTY_KEY)
+    except redis.RedisError:
+        pass
+
+def get_similar(product_id: int) -> List[list]:
+    """Stored [id, score] neighbours of a product, best first (O(1) lookup)."""
+    try:
+        stored = redis_client.get(SIMILAR_KEY.format(product_id))
+    except redis.RedisError:
+        return []
+    return json.loads(stored) if stored else []
+
+def _run_worker(engine: Engine, interval: int):
+    while True:
+        try:
+            # One process builds or refreshes at a time
+            if redis_client.set(LOCK_KEY, 1, nx=True, ex=max(interval * 10, 600)):
+                try:
+                    if not redis_client.exists(BUILT_KEY):
+                        rebuild_all(engine)
+                    while refresh_changed(engine):
+                        pass
+                finally:
+                    redis_client.delete(LOCK_KEY)
+        except Exception as e:
+            print(f"⚠️ Similar products job failed: {e}")
+        time.sleep(interval)
+
+def start_similarity_worker(engine: Engine, interval: int):
+    """Build neighbours in the background if missing, then apply queued changes every `interval` seconds."""
+    if np is None:
+        print("⚠️ Similar products disabled: numpy is not installed")
+        return
+    threading.Thread(target=_run_worker, args=(engine, interval), name="similar-products", daemon=True).start()
@@ -0,0 +1,196 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+from app.models.order import OrderItem
+from app.models.product import Product, Category
+
+# Ranges longer than this are answered from a per-prefix top list instead of a scan
+SCAN_LIMIT = 500
+MAX_SUGGESTIONS = 20
+# Names are indexed from each word start, up to this many words in
+MAX_WORDS = 8
+
+# ("product", id) | ("brand", lowercase brand) | ("category", id)
+Suggestion = Tuple[str, object]
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+def _keys(text: str) -> List[str]:
+    words = normalize(text).split()
+    return [" ".join(words[i:]) for i in range(min(len(words), MAX_WORDS))]
+
+class SuggestIndex:
+    """
+    Prefix index over product names, brands and category names, ranked by popularity
+    (units sold plus review count; brands and categories sum their products).
+    Keys are kept in one sorted list and a prefix is a bisect range over it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._engine: Optional[Engine] = None
+        self._reset()
+
+    def _reset(self):
+        self._keys: List[Tuple[str, Suggestion]] = []
+        self._keys_of: Dict[Suggestion, List[str]] = {}
+        self._text: Dict[Suggestion, str] = {}
+        self._score: Dict[Suggestion, int] = {}
+        self._products: Dict[int, tuple] = {}  # id -> (brand key, category id, score)
+        self._brand_products: Dict[str, int] = {}
+        self._top: Dict[str, List[Suggestion]] = {}
+
+    @staticmethod
+    def _product_rows(conn, product_ids: Optional[List[int]] = None):
+        sold = select(OrderItem.product_id, func.sum(OrderItem.quantity).label("sold")).group_by(OrderItem.product_id)
+        products = select(
+            Product.id, Product.name, Product.brand, Product.category_id, Product.is_active, Product.rating_count
+        )
+        if product_ids is not None:
+            sold = sold.where(OrderItem.product_id.in_(product_ids))
+            products = products.where(Product.id.in_(product_ids))
+        sales = dict(conn.execute(sold).all())
+        return [(row, (sales.get(row.id) or 0) + (row.rating_count or 0)) for row in conn.execute(products)]
+
+    def build(self, engine: Engine):
+        with engine.connect() as conn:
+            categories = conn.execute(select(Category.id, Category.name)).all()
+            products = self._product_rows(conn)
+        with self._lock:
+            self._engine = None
+            self._reset()
+            for category in categories:
+                self._set_category(category.id, category.name)
+            for row, score in products:
+                self._set_product(row, score)
+            self._keys.sort()
+            self._engine = engine
+        print(f"✅ Suggest index built: {len(self._keys)} prefix keys")
+
+    def refresh(self, product_ids: Iterable[int], category_ids: Iterable[int] = ()):
+        """Re-read changed products and categories; called after commits that wrote them."""
+        product_ids, category_ids = list(product_ids), list(category_ids)
+        if not self._engine:
+            return
+        with self._engine.connect() as conn:
+            categories = conn.execute(
+                select(Category.id, Category.name).where(Category.id.in_(category_ids))
+            ).all() if category_ids else []
+            products = self._product_rows(conn, product_ids) if product_ids else []
+        with self._lock:
+            for category in categories:
+                self._set_category(category.id, category.name)
+            for category_id in set(category_ids) - {category.id for category in categories}:
+                self._index(("category", category_id), None)
+            found = set()
+            for row, score in products:
+                self._set_product(row, score)
+                found.add(row.id)
+            for product_id in set(product_ids) - found:
+                self._remove_product(product_id)
+
+    # --- Maintenance (callers hold the lock) ---
+
+    def _drop_cached(self, suggestion: Suggestion):
+        for key in self._keys_of.get(suggestion, ()):
+            for end in range(1, len(key) + 1):
+                self._top.pop(key[:end], None)
+
+    def _index(self, suggestion: Suggestion, text: Optional[str]):
+        """Point `suggestion` at the keys for `text`, or unindex it when text is None."""
+        self._drop_cached(suggestion)
+        for key in self._keys_of.pop(suggestion, ()):
+            index = bisect_left(self._keys, (key, suggestion))
+            if index < len(self._keys) and self._keys[index] == (key, suggestion):
+                del self._keys[index]
+        self._text.pop(suggestion, None)
+        if text is None:
+            self._score.pop(suggestion, None)
+            return
+        keys = _keys(text)
+        self._keys_of[suggestion] = keys
+        self._text[suggestion] = text
+        self._score.setdefault(suggestion, 0)
+        for key in keys:
+            if self._engine is None:
+                self._keys.append((key, suggestion))  # build() sorts once at the end
+            else:
+                insort(self._keys, (key, suggestion))
+        self._drop_cached(suggestion)
+
+    def _add_score(self, suggestion: Suggestion, delta: int):
+        if delta and suggestion in self._score:
+            self._score[suggestion] += delta
+            self._drop_cached(suggestion)
+
+    def _set_category(self, category_id: int, name: str):
+        suggestion = ("category", category_id)
+        if self._text.get(suggestion) != name:
+            self._index(suggestion, name)
+
+    def _remove_product(self, product_id: int):
+        previous = self._products.pop(product_id, None)
+        if previous is None:
+            return
+        brand, category_id, score = previous
+        self._index(("product", product_id), None)
+        self._add_score(("category", category_id), -score)
+        if brand:
+            self._add_score(("brand", brand), -score)
+            self._brand_products[brand] -= 1
+            if not self._brand_products[brand]:
+                del self._brand_products[brand]
+                self._index(("brand", brand), None)
+
+    def _set_product(self, row, score: int):
+        self._remove_product(row.id)
+        if not row.is_active:
+            return
+        brand = normalize(row.brand) if row.brand else ""
+        suggestion = ("product", row.id)
+        self._index(suggestion, row.name)
+        self._score[suggestion] = score
+        self._products[row.id] = (brand, row.category_id, score)
+        self._add_score(("category", row.category_id), score)
+        if brand:
+            if brand not in self._brand_products:
+                self._brand_products[brand] = 0
+                self._index(("brand", brand), row.brand)
+            self._brand_products[brand] += 1
+            self._add_score(("brand", brand), score)
+
+    # --- Lookup ---
+
+    def _rank(self, lo: int, hi: int, limit: int) -> List[Suggestion]:
+        matches = {suggestion for _, suggestion in self._keys[lo:hi]}
+        return heapq.nsmallest(limit, matches, key=lambda s: (-self._score[s], self._text[s]))
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect_left(self._keys, (prefix,))
+            hi = bisect_left(self._keys, (prefix + "\uffff",), lo)
+            if hi - lo > SCAN_LIMIT:
+                # Short, popular prefixes: rank the range once, until a write touches it
+                top = self._top.get(prefix)
+                if top is None:
+                    top = self._top[prefix] = self._rank(lo, hi, MAX_SUGGESTIONS)
+                top = top[:limit]
+            else:
+                top = self._rank(lo, hi, limit)
+            return [
+                {"type": kind, "text": self._text[(kind, value)], **({"id": value} if kind != "brand" else {})}
+                for kind, value in top
+            ]
+
+suggest_index = SuggestIndex()